@@ -1,5 +1,6 @@
 import axiosInstance from './axiosConfig';
 import type { User, RegisterData, LoginData, LoginResponse, UpdateUserData } from '../types/user.types';
+import { REFRESH_TOKEN_KEY } from '../utils/constants';
 
 export const authApi = {
   register: async (data: RegisterData) => {
@@ -12,6 +13,13 @@ export const authApi = {
     return response.data;
   },
 
+  // Revokes the access token and the refresh token on the server
+  logout: async () => {
+    const refreshToken = localStorage.getItem(REFRESH_TOKEN_KEY);
+    const response = await axiosInstance.post('/logout', refreshToken ? { refresh_token: refreshToken } : {});
+    return response.data;
+  },
+
   getCurrentUser: async (): Promise<User> => {
     const response = await axiosInstance.get<User>('/users/me');
     return response.data;
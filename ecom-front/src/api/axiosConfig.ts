@@ -1,5 +1,5 @@
 import axios, { AxiosError, type InternalAxiosRequestConfig } from 'axios';
-import { API_BASE_URL, AUTH_TOKEN_KEY } from '../utils/constants';
+import { API_BASE_URL, AUTH_TOKEN_KEY, REFRESH_TOKEN_KEY } from '../utils/constants';
 
 const axiosInstance = axios.create({
   baseURL: API_BASE_URL,
@@ -22,13 +22,46 @@ axiosInstance.interceptors.request.use(
   }
 );
 
+// One refresh at a time, shared by every request that got a 401 meanwhile
+let refreshing: Promise<string> | null = null;
+
+const refreshAccessToken = (refreshToken: string) => {
+  refreshing ??= axios
+    .post<{ access_token: string }>(`${API_BASE_URL}/token/refresh`, null, {
+      headers: { Authorization: `Bearer ${refreshToken}` },
+    })
+    .then((response) => {
+      localStorage.setItem(AUTH_TOKEN_KEY, response.data.access_token);
+      return response.data.access_token;
+    })
+    .finally(() => {
+      refreshing = null;
+    });
+  return refreshing;
+};
+
 // Response interceptor for error handling
 axiosInstance.interceptors.response.use(
   (response) => response,
-  (error: AxiosError) => {
+  async (error: AxiosError) => {
+    const request = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined;
+    const refreshToken = localStorage.getItem(REFRESH_TOKEN_KEY);
+
+    // Access tokens are short-lived: renew it once and retry the request
+    if (error.response?.status === 401 && request && !request._retried && refreshToken) {
+      request._retried = true;
+      try {
+        await refreshAccessToken(refreshToken);
+        return axiosInstance(request);
+      } catch {
+        // Refresh token expired or revoked
+      }
+    }
+
     if (error.response?.status === 401) {
-      // Clear token and redirect to login
+      // Clear tokens and redirect to login
       localStorage.removeItem(AUTH_TOKEN_KEY);
+      localStorage.removeItem(REFRESH_TOKEN_KEY);
       window.location.href = '/login';
     }
     return Promise.reject(error);
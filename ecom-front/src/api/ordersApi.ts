@@ -18,8 +18,11 @@ export const ordersApi = {
     return response.data;
   },
 
+  // Products and totals come back with the orders, in one request
   getOrdersByUser: async (userId: number): Promise<Order[]> => {
-    const response = await axiosInstance.get<Order[]>(`/orders/user/${userId}`);
+    const response = await axiosInstance.get<Order[]>(`/orders/user/${userId}`, {
+      params: { expand: 'products,total' },
+    });
     return response.data;
   },
 
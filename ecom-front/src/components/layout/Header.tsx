@@ -3,6 +3,7 @@ import { useCart } from '../../hooks/useCart';
 import { useAuth } from '../../hooks/useAuth';
 import { useAppDispatch } from '../../store/hooks';
 import { logout } from '../../features/auth/authSlice';
+import { authApi } from '../../api/authApi';
 import { APP_NAME, ROUTES } from '../../utils/constants';
 
 export const Header = () => {
@@ -10,7 +11,12 @@ export const Header = () => {
   const { isAuthenticated, user } = useAuth();
   const dispatch = useAppDispatch();
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    try {
+      await authApi.logout();
+    } catch {
+      // The tokens expire on their own; log out locally either way
+    }
     dispatch(logout());
   };
 
@@ -1,6 +1,6 @@
 import { createSlice, type PayloadAction } from '@reduxjs/toolkit';
 import type { User } from '../../types/user.types';
-import { AUTH_TOKEN_KEY } from '../../utils/constants';
+import { AUTH_TOKEN_KEY, REFRESH_TOKEN_KEY } from '../../utils/constants';
 
 interface AuthState {
   user: User | null;
@@ -27,11 +27,14 @@ const authSlice = createSlice({
       state.isAuthenticated = true;
       localStorage.setItem(AUTH_TOKEN_KEY, action.payload);
     },
-    setCredentials: (state, action: PayloadAction<{ user: User; token: string }>) => {
+    setCredentials: (state, action: PayloadAction<{ user: User; token: string; refreshToken?: string }>) => {
       state.user = action.payload.user;
       state.token = action.payload.token;
       state.isAuthenticated = true;
       localStorage.setItem(AUTH_TOKEN_KEY, action.payload.token);
+      if (action.payload.refreshToken) {
+        localStorage.setItem(REFRESH_TOKEN_KEY, action.payload.refreshToken);
+      }
     },
     updateUserProfile: (state, action: PayloadAction<User>) => {
       state.user = action.payload;
@@ -41,6 +44,7 @@ const authSlice = createSlice({
       state.token = null;
       state.isAuthenticated = false;
       localStorage.removeItem(AUTH_TOKEN_KEY);
+      localStorage.removeItem(REFRESH_TOKEN_KEY);
     },
   },
 });
@@ -27,7 +27,7 @@ export const CheckoutPage = () => {
     try {
       await createOrderMutation.mutateAsync({
         user_id: user.id,
-        product_ids: items.map((item) => item.id),
+        items: items.map((item) => ({ product_id: item.id, quantity: item.quantity })),
       });
 
       clearCart();
@@ -22,7 +22,7 @@ export const LoginPage = () => {
     onSuccess: async (data) => {
       // Get user details
       const user = await authApi.getCurrentUser();
-      dispatch(setCredentials({ user, token: data.access_token }));
+      dispatch(setCredentials({ user, token: data.access_token, refreshToken: data.refresh_token }));
       navigate(ROUTES.HOME);
     },
     onError: () => {
@@ -4,7 +4,7 @@ import { useOrdersByUser } from '../hooks/useOrders';
 import { Loading } from '../components/common/Loading';
 import { ErrorMessage } from '../components/common/ErrorMessage';
 import { Button } from '../components/common/Button';
-import { formatShortDate } from '../utils/formatters';
+import { formatCurrency, formatShortDate } from '../utils/formatters';
 
 export const OrdersPage = () => {
   const { user, isAuthenticated } = useAuth();
@@ -58,7 +58,16 @@ export const OrdersPage = () => {
 
             {order.products && order.products.length > 0 && (
               <div className="text-sm text-(--ctp-subtext0)">
-                {order.products.length} item{order.products.length !== 1 ? 's' : ''}
+                {order.item_count} item{order.item_count !== 1 ? 's' : ''}:{' '}
+                {order.products
+                  .map((line) => (line.quantity > 1 ? `${line.product_name} × ${line.quantity}` : line.product_name))
+                  .join(', ')}
+              </div>
+            )}
+
+            {order.total && (
+              <div className="mt-2 font-semibold text-(--ctp-text)">
+                {formatCurrency(order.total.total_price)}
               </div>
             )}
 
@@ -4,12 +4,27 @@ export interface Order {
   id: number;
   user_id: number;
   order_date: string;
-  products?: Product[];
+  total_price: number;
+  item_count: number;
+  // Only present when requested with ?expand=products,total
+  products?: OrderLine[];
+  total?: OrderTotal;
+}
+
+// A product in an order, with the units bought and the price they were bought at
+export interface OrderLine extends Product {
+  quantity: number;
+  unit_price: number;
+}
+
+export interface OrderItem {
+  product_id: number;
+  quantity: number;
 }
 
 export interface CreateOrderData {
   user_id: number;
-  product_ids: number[];
+  items: OrderItem[];
 }
 
 export interface OrderTotal {
@@ -19,6 +19,7 @@ export interface LoginData {
 
 export interface LoginResponse {
   access_token: string;
+  refresh_token: string;
   user_id: number;
   name: string;
 }
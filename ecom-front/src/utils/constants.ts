@@ -15,6 +15,7 @@ export const ROUTES = {
 } as const;
 
 export const AUTH_TOKEN_KEY = 'auth_token';
+export const REFRESH_TOKEN_KEY = 'refresh_token';
 export const CART_STORAGE_KEY = 'shopping_cart';
 
 export const PRODUCTS_PER_PAGE = 12;
@@ -0,0 +1,180 @@
+# ASGI entry point: async serving mode for the catalog reads
+#
+#   uvicorn asgi:app --workers 4
+#   gunicorn -k uvicorn.workers.UvicornWorker --workers 4 asgi:app
+#
+# GET /products and GET /products/<id> run on an async SQLAlchemy engine, so
+# one worker can keep many catalog reads waiting on MySQL at once instead of
+# blocking a whole sync worker per request. They go through the same Flask
+# request pipeline (URL matching, before/after_request hooks, CORS, ETags,
+# product cache), build their queries and payloads with the helpers in
+# products.py, and therefore return byte-identical responses to the WSGI app.
+#
+# Every other route is handed to the Flask app unchanged, running on a thread
+# pool. The WSGI entry point (gunicorn 'app:create_app()') keeps working as before.
+import io
+import os
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import jsonify, request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from etags import conditional_response
+from extensions import product_cache
+from pool_metrics import engine_options_from_env
+from products import plan_products_request, product_by_id_query, cache_entry
+from schemas import product_rows
+
+# Sync driver -> asyncio driver for the same database
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+mysqlconnector': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_uri(database_uri):
+    url = make_url(database_uri)
+    drivername = ASYNC_DRIVERS.get(url.drivername)
+    if drivername is None:
+        raise ValueError(f'No async driver for {url.drivername}; set ASYNC_DATABASE_URI')
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+flask_app = create_app()
+
+# Same database and pool sizing (DB_POOL_*) as the sync engine
+flask_app.config['ASYNC_DATABASE_URI'] = os.environ.get(
+    'ASYNC_DATABASE_URI',
+    async_database_uri(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+)
+async_engine = create_async_engine(
+    flask_app.config['ASYNC_DATABASE_URI'],
+    **engine_options_from_env(flask_app.config['ASYNC_DATABASE_URI'], is_async=True)
+)
+
+
+# ----- Async Product Endpoints -----
+# Mirrors of the views in products.py; only the database calls differ
+
+async def get_products():
+    cache_key = product_cache.page_key(request.args.to_dict())
+    cached = product_cache.get_page(cache_key)
+    if cached is None:
+        plan, error = plan_products_request(request.args)
+        if error:
+            return jsonify(error[0]), error[1]
+
+        rows_query, count_query, build = plan
+        async with async_engine.connect() as connection:
+            products = (await connection.execute(rows_query)).all()
+            total = (await connection.execute(count_query)).scalar_one() if count_query is not None else None
+
+        cached = cache_entry(build(products, total))
+        product_cache.set_page(cache_key, cached)
+
+    return conditional_response(cached['etag'], lambda: jsonify(cached['body']), shared=True)
+
+
+async def get_product(id):
+    cached = product_cache.get_product(id)
+    if cached is None:
+        async with async_engine.connect() as connection:
+            product = (await connection.execute(product_by_id_query(id))).first()
+        if not product:
+            return jsonify({'message': 'Product not found'}), 404
+
+        cached = cache_entry(product_rows.row_to_dict(product))
+        product_cache.set_product(id, cached)
+
+    return conditional_response(cached['etag'], lambda: jsonify(cached['body']), shared=True)
+
+
+# Flask endpoint name -> async view
+ASYNC_VIEWS = {
+    'products.get_products': get_products,
+    'products.get_product': get_product,
+}
+
+
+# ----- Dispatch -----
+
+# asgiref runs every WSGI call on one shared thread by default, which would
+# serialize the fallback routes. Inside a ThreadSensitiveContext the call
+# gets a thread of its own instead (as Django's ASGI handler does). Tested
+# against asgiref 3.12.1, pinned in requirements.txt.
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        async with ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+
+wsgi_fallback = ThreadedWsgiToAsgi(flask_app)
+
+
+def build_environ(scope):
+    instance = WsgiToAsgiInstance(flask_app)
+    instance.scope = scope
+    return instance.build_environ(scope, io.BytesIO())
+
+
+# Flask's full_dispatch_request with an awaited view
+async def dispatch(view, environ):
+    with flask_app.request_context(environ):
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    rv = await view(**request.view_args)
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+            response = flask_app.finalize_request(rv)
+        except Exception as e:
+            response = flask_app.handle_exception(e)
+
+        return response.status_code, response.get_wsgi_headers(environ), b''.join(response.get_app_iter(environ))
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        environ = build_environ(scope)
+        adapter = flask_app.url_map.bind_to_environ(environ)
+        try:
+            endpoint, _ = adapter.match()
+        except HTTPException:
+            # 404/405/redirects are Flask's to answer
+            endpoint = None
+
+        view = ASYNC_VIEWS.get(endpoint)
+        if view is not None:
+            status, headers, body = await dispatch(view, environ)
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [(name.lower().encode('latin1'), value.encode('latin1'))
+                            for name, value in headers.to_wsgi_list()]
+            })
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+    await wsgi_fallback(scope, receive, send)
@@ -0,0 +1,298 @@
+# Read-through cache for serialized product payloads
+#
+# Interchangeable backends sit behind the same get/set/delete/incr API
+# (also used for the auth rate limit counters in ratelimit.py and the token
+# denylist in tokens.py):
+#   - MemoryCache: in-process LRU with per-entry TTL (default, one per worker)
+#   - RedisCache: shared across workers; takes any redis-py compatible client,
+#     so tests can hand it a local stand-in such as fakeredis
+#   - DatabaseCache: shared across workers through the cache_entries table,
+#     for state that must not differ between workers when there is no redis
+#
+# ProductCache adds the product-specific keys, hit/miss counters and
+# invalidation. Product pages are keyed by a generation number that every
+# write bumps, so a single write invalidates all cached pages at once.
+from collections import OrderedDict
+import json
+import threading
+import time
+
+from sqlalchemy import delete, select
+
+
+class MemoryCache:
+    def __init__(self, max_entries=1024, clock=time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and self._clock() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = self._clock() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    # ttl only applies when the counter is created
+    def incr(self, key, ttl=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[1] is not None and self._clock() >= entry[1]):
+                entry = (0, self._clock() + ttl if ttl else None)
+            value, expires_at = entry
+            self._entries[key] = (value + 1, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return value + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    def __init__(self, client, prefix='ecom:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        # redis is only needed when the shared backend is actually configured
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def incr(self, key, ttl=None):
+        if not ttl:
+            return self.client.incr(self.prefix + key)
+        # Create the counter with its expiry first, then count
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, 0, ex=ttl, nx=True)
+        pipe.incr(self.prefix + key)
+        return pipe.execute()[1]
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class DatabaseCache:
+    # Expired rows are skipped on read and deleted every this many writes
+    prune_every = 100
+
+    # session: the app's db.session; table: models.CacheEntry.__table__
+    def __init__(self, session, table, clock=time.time):
+        self.session = session
+        self.table = table
+        self._clock = clock
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _expires_at(self, ttl):
+        return self._clock() + ttl if ttl else None
+
+    def _live(self, key, for_update=False):
+        query = select(self.table.c.value, self.table.c.expires_at).where(self.table.c.key == key)
+        if for_update:
+            query = query.with_for_update()
+        row = self.session.execute(query).first()
+        if row is None or (row.expires_at is not None and row.expires_at <= self._clock()):
+            return None
+        return row
+
+    def get(self, key):
+        row = self._live(key)
+        return None if row is None else row.value
+
+    # Writes commit the session they run in, so other workers see them at
+    # once; call them after the request's own changes are committed
+    def _write(self, key, value, expires_at):
+        # order_totals imports the models, which import this module
+        from order_totals import upsert_statement
+        self.session.execute(
+            upsert_statement(self.table, lambda new: {'value': new['value'], 'expires_at': new['expires_at']}),
+            [{'key': key, 'value': value, 'expires_at': expires_at}]
+        )
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        if prune:
+            self.session.execute(delete(self.table).where(self.table.c.expires_at <= self._clock()))
+        self.session.commit()
+
+    def set(self, key, value, ttl=None):
+        self._write(key, value, self._expires_at(ttl))
+
+    def delete(self, *keys):
+        if keys:
+            self.session.execute(delete(self.table).where(self.table.c.key.in_(keys)))
+            self.session.commit()
+
+    # ttl only applies when the counter is created
+    def incr(self, key, ttl=None):
+        row = self._live(key, for_update=True)
+        if row is None:
+            value, expires_at = 1, self._expires_at(ttl)
+        else:
+            value, expires_at = row.value + 1, row.expires_at
+        self._write(key, value, expires_at)
+        return value
+
+    def clear(self):
+        self.session.execute(delete(self.table))
+        self.session.commit()
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def incr(self, key, ttl=None):
+        return 0
+
+    def clear(self):
+        pass
+
+
+class ProductCache:
+    PAGES_VERSION_KEY = 'products:pages:version'
+
+    def __init__(self, backend, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _record(self, value):
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    # ----- Single products -----
+
+    @staticmethod
+    def product_key(product_id):
+        return f'product:{product_id}'
+
+    def get_product(self, product_id):
+        return self._record(self.backend.get(self.product_key(product_id)))
+
+    def set_product(self, product_id, payload):
+        self.backend.set(self.product_key(product_id), payload, self.ttl)
+
+    # ----- Product pages -----
+
+    def _pages_version(self):
+        version = self.backend.get(self.PAGES_VERSION_KEY)
+        if version is None:
+            # Start from the clock so a lost counter never reuses old page keys
+            version = time.time_ns()
+            self.backend.set(self.PAGES_VERSION_KEY, version)
+        return version
+
+    def page_key(self, args):
+        query = '&'.join(f'{k}={v}' for k, v in sorted(args.items()))
+        return f'products:pages:{self._pages_version()}:{query}'
+
+    def get_page(self, key):
+        return self._record(self.backend.get(key))
+
+    def set_page(self, key, payload):
+        self.backend.set(key, payload, self.ttl)
+
+    # ----- Invalidation -----
+
+    def invalidate_products(self, product_ids=()):
+        self.backend.delete(*(self.product_key(i) for i in product_ids))
+        if self.backend.get(self.PAGES_VERSION_KEY) is None:
+            self._pages_version()
+        self.backend.incr(self.PAGES_VERSION_KEY)
+        with self._lock:
+            self.invalidations += 1
+
+    # Every product changed: drops what this process cached. A shared
+    # backend only needs new page keys; the writer deleted its entries.
+    def invalidate_all(self):
+        if isinstance(self.backend, MemoryCache):
+            self.backend.clear()
+        self.invalidate_products()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            'backend': type(self.backend).__name__,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'invalidations': self.invalidations
+        }
+        if isinstance(self.backend, MemoryCache):
+            stats['entries'] = len(self.backend)
+            stats['max_entries'] = self.backend.max_entries
+        return stats
+
+
+# Reads <prefix>_BACKEND, <prefix>_MAX_ENTRIES and <prefix>_REDIS_URL
+def create_backend(config, prefix='PRODUCT_CACHE'):
+    backend = config.get(f'{prefix}_BACKEND', 'memory')
+    if backend == 'memory':
+        return MemoryCache(max_entries=config.get(f'{prefix}_MAX_ENTRIES', 1024))
+    if backend == 'redis':
+        return RedisCache.from_url(config[f'{prefix}_REDIS_URL'])
+    if backend == 'database':
+        # The models import this module, so they are loaded on first use
+        from extensions import db
+        from models import CacheEntry
+        return DatabaseCache(db.session, CacheEntry.__table__)
+    if backend == 'none':
+        return NullCache()
+    raise ValueError(f'Unknown {prefix}_BACKEND: {backend}')
@@ -0,0 +1,83 @@
+# Purge hook for the nginx micro-cache in front of the catalog reads
+#
+# Open-source nginx has no purge API, so purging a path means refetching
+# it: a GET whose X-Cache-Refresh header carries EDGE_CACHE_PURGE_SECRET
+# skips the cached copy and stores the fresh response in its place (see
+# nginx/nginx.conf). The Host is not part of nginx's cache key, so the
+# refetch replaces the copy clients read under the public host. Product
+# writes only queue the paths. One background thread per worker sends the
+# requests, because a write that waited on nginx could end up waiting on a
+# worker that is itself busy.
+#
+# Cached pages (/products?...) can't be listed, so they are not refetched;
+# they expire within EDGE_CACHE_TTL seconds.
+import logging
+import os
+import queue
+import threading
+import urllib.error
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+
+class EdgeCachePurger:
+    # A bulk write touching more products than this leaves them to expire
+    max_paths = 100
+
+    def __init__(self, base_url, secret, timeout=2.0, opener=urllib.request.urlopen):
+        # Without the secret nginx would serve the cached copy, so don't bother
+        self.base_url = base_url.rstrip('/') if base_url and secret else ''
+        self.secret = secret
+        self.timeout = timeout
+        self._opener = opener
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['EDGE_CACHE_PURGE_URL'], config['EDGE_CACHE_PURGE_SECRET'])
+
+    def purge(self, paths):
+        if not self.base_url:
+            return
+        paths = list(paths)
+        if not paths or len(paths) > self.max_paths:
+            return
+        pending = self._pending()
+        for path in paths:
+            pending.put(path)
+
+    # gunicorn forks workers from a preloaded master, and threads don't
+    # survive a fork, so each process starts its own sender
+    def _pending(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.SimpleQueue()
+                threading.Thread(target=self._run, args=(self._queue,), name='edge-cache-purge', daemon=True).start()
+            return self._queue
+
+    def _run(self, pending):
+        while True:
+            # Refetch each path once, however many writes queued it meanwhile
+            paths = {pending.get()}
+            while True:
+                try:
+                    paths.add(pending.get_nowait())
+                except queue.Empty:
+                    break
+            for path in sorted(paths):
+                self.refresh(path)
+
+    def refresh(self, path):
+        request = urllib.request.Request(self.base_url + path, headers={'X-Cache-Refresh': self.secret})
+        try:
+            with self._opener(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError:
+            # e.g. 404 for a deleted product; the old copy expires on its own
+            pass
+        except OSError as e:
+            logger.warning('Edge cache refresh of %s failed: %s', path, e)
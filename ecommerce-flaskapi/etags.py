@@ -0,0 +1,45 @@
+# Conditional GET helpers
+import hashlib
+import json
+
+from flask import current_app, request
+
+
+# Strong ETags are a hash of whatever fully determines the response body,
+# so a matching If-None-Match can be answered with 304 before serializing
+def make_etag(*parts):
+    raw = json.dumps(parts, default=str, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+# Anonymous catalog reads: shared caches (the nginx micro-cache) may keep
+# the response for EDGE_CACHE_TTL seconds, browsers revalidate on every use.
+# CORS headers depend on the Origin, so cached copies are kept per Origin.
+def allow_shared_caching(response):
+    ttl = current_app.config['EDGE_CACHE_TTL']
+    if not ttl:
+        response.cache_control.no_cache = True
+        return response
+
+    response.cache_control.public = True
+    response.cache_control.max_age = 0
+    response.cache_control.must_revalidate = True
+    response.cache_control.s_maxage = ttl
+    response.vary.add('Origin')
+    return response
+
+# build_response is only called when the client's copy is out of date;
+# shared=True marks a response any client may be served (see above)
+def conditional_response(etag, build_response, shared=False):
+    # Weak comparison per RFC 9110, since gzip in front of us may weaken the tag
+    if request.if_none_match.contains_weak(etag):
+        response, status = current_app.response_class(), 304
+    else:
+        response, status = build_response(), 200
+
+    response.set_etag(etag)
+    if shared:
+        allow_shared_caching(response)
+    else:
+        # Let browsers keep the body but revalidate it on every use
+        response.cache_control.no_cache = True
+    return response, status
@@ -0,0 +1,65 @@
+# Streaming exports (NDJSON / CSV) for the large list endpoints
+import csv
+import io
+
+from flask import Response, current_app, request, jsonify, stream_with_context
+
+from extensions import db
+
+
+# Walk a query in primary-key order, one LIMIT batch at a time. Unlike a
+# server-side cursor this works with every driver (mysql-connector has them
+# disabled) and never holds more than one batch in memory.
+def iter_keyset_batches(query, id_column, batch_size):
+    last_id = None
+    while True:
+        batch_query = query.order_by(id_column).limit(batch_size)
+        if last_id is not None:
+            batch_query = batch_query.where(id_column > last_id)
+        rows = db.session.execute(batch_query).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1].id
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def stream_export(name, query, id_column, serializer):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': 'format must be one of: ndjson, csv'}), 400
+
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    dumps = current_app.json.dumps
+
+    def generate_ndjson():
+        for rows in iter_keyset_batches(query, id_column, batch_size):
+            yield ''.join(dumps(item, separators=(',', ':')) + '\n' for item in serializer.dump(rows))
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(serializer.field_names)
+        for rows in iter_keyset_batches(query, id_column, batch_size):
+            writer.writerows(
+                [item[field] for field in serializer.field_names]
+                for item in serializer.dump(rows)
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    generate = generate_ndjson if export_format == 'ndjson' else generate_csv
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        # nginx would otherwise buffer the whole export before sending it on
+        headers={'Content-Disposition': f'attachment; filename={name}.{export_format}', 'X-Accel-Buffering': 'no'}
+    )
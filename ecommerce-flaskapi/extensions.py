@@ -0,0 +1,73 @@
+# Extension objects shared by the blueprints, bound to an app in create_app()
+#
+# Nothing here reads configuration or touches the database at import time.
+# The services that are built from configuration (product cache, search
+# index, password hasher, auth rate limiters, token denylist, user cache,
+# edge cache purger, cache invalidation log) are created per app by
+# init_services() and reached through proxies, so the blueprints import them
+# like any other module global.
+from flask import current_app
+from flask_jwt_extended import JWTManager
+from flask_marshmallow import Marshmallow
+from flask_migrate import Migrate
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import DeclarativeBase
+from werkzeug.local import LocalProxy
+
+from cache import ProductCache, create_backend
+from edge_cache import EdgeCachePurger
+from invalidations import InvalidationLog
+from passwords import PasswordHasher
+from ratelimit import RateLimiter, parse_limit
+from request_metrics import RequestMetrics
+from search import InvertedIndex
+from tokens import TokenDenylist, UserCache
+
+
+# Base Model
+class Base(DeclarativeBase):
+    pass
+
+
+db = SQLAlchemy(model_class=Base)
+ma = Marshmallow()
+jwt = JWTManager()
+migrate = Migrate()
+request_metrics = RequestMetrics()
+
+
+def init_services(app):
+    # The models import this module, so they are loaded here
+    from models import CacheInvalidation
+
+    config = app.config
+    rate_limit_backend = create_backend(config, prefix='RATE_LIMIT')
+    refresh_expires = config['JWT_REFRESH_TOKEN_EXPIRES']
+    app.extensions.update({
+        'product_cache': ProductCache(create_backend(config), ttl=config['PRODUCT_CACHE_TTL']),
+        'search_index': InvertedIndex(ttl=config['SEARCH_INDEX_TTL']),
+        'password_hasher': PasswordHasher.from_config(config),
+        'auth_ip_limiter': RateLimiter(rate_limit_backend, *parse_limit(config['AUTH_RATE_LIMIT_PER_IP']), name='auth-ip'),
+        'auth_email_limiter': RateLimiter(rate_limit_backend, *parse_limit(config['AUTH_RATE_LIMIT_PER_EMAIL']), name='auth-email'),
+        'token_denylist': TokenDenylist(create_backend(config, prefix='TOKEN_DENYLIST'),
+                                        max_ttl=int(refresh_expires.total_seconds()) if refresh_expires else None),
+        'user_cache': UserCache(create_backend(config, prefix='USER_CACHE'), ttl=config['USER_CACHE_TTL']),
+        'edge_cache': EdgeCachePurger.from_config(config),
+        'cache_invalidations': InvalidationLog(db.session, CacheInvalidation.__table__,
+                                               interval=config['CACHE_SYNC_INTERVAL']),
+    })
+
+
+def _service(name):
+    return LocalProxy(lambda: current_app.extensions[name])
+
+
+product_cache = _service('product_cache')
+search_index = _service('search_index')
+password_hasher = _service('password_hasher')
+auth_ip_limiter = _service('auth_ip_limiter')
+auth_email_limiter = _service('auth_email_limiter')
+token_denylist = _service('token_denylist')
+user_cache = _service('user_cache')
+edge_cache = _service('edge_cache')
+cache_invalidations = _service('cache_invalidations')
@@ -0,0 +1,59 @@
+# gunicorn loads this file from the working directory automatically
+#
+# Prometheus multiprocess mode (see request_metrics.py): every worker writes
+# its metrics to files in PROMETHEUS_MULTIPROC_DIR, so the directory is
+# emptied when gunicorn starts, and a worker's files are marked dead when
+# it exits.
+#
+# The app is imported and created once in the master (preload_app), so a new
+# worker - at boot, after max_requests, or when scaling up with TTIN - is a
+# fork that can take requests straight away instead of re-importing
+# everything. Set GUNICORN_PRELOAD=0 to load the app in each worker instead
+# (e.g. for --reload during development).
+#
+# With more than one worker, gunicorn refuses to start on a per-process
+# (memory) token denylist.
+#
+# Workers are threaded (gthread) so they keep connections from nginx open
+# between requests; sync workers close every connection, which makes
+# nginx's upstream keepalive pool useless. The keepalive timeout outlasts
+# nginx's (30s) so nginx always drops an idle connection first.
+import glob
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 35))
+
+
+def on_starting(server):
+    # A per-process denylist only blocks a token on the worker that revoked
+    # it; every other worker would keep accepting it (default: database)
+    if server.cfg.workers > 1 and os.environ.get('TOKEN_DENYLIST_BACKEND') == 'memory':
+        raise SystemExit('TOKEN_DENYLIST_BACKEND=memory needs --workers 1; use database or redis')
+
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+# create_app() never connects, but if anything in the master did, the
+# workers must not share its pooled connections
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from extensions import db
+        # The Flask app the master loaded
+        app = server.app.wsgi()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,123 @@
+# Cache invalidation across processes
+#
+# The product cache, search index, product count and user cache default to
+# per-process memory, and every gunicorn worker (and the run-jobs process)
+# has its own copy. A write only clears the copy of the process that made
+# it, so it also records what it changed in the cache_invalidations table.
+# Before handling a request, every process reads the rows added since it
+# last looked, at most every CACHE_SYNC_INTERVAL seconds, and drops those
+# entries from its own caches. Other workers therefore serve a changed
+# product or user for at most that long, instead of until the cache TTL.
+#
+# Handlers are registered per kind by the blueprints with
+# @invalidation_handler(kind); handler(keys) gets the changed keys as
+# strings, or None for "everything" (a bulk write, or a process that fell
+# further behind than the log is kept).
+import threading
+import time
+from datetime import timedelta
+
+from flask import current_app, request
+from sqlalchemy import delete, func, insert, select
+
+# kind -> handler(keys)
+INVALIDATION_HANDLERS = {}
+
+
+def invalidation_handler(kind):
+    def register(handler):
+        INVALIDATION_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+class InvalidationLog:
+    # A write touching more keys than this invalidates everything instead
+    max_keys = 1000
+    # Rows older than this are deleted every prune_every records; a process
+    # that has not synced for longer drops everything
+    retention = timedelta(hours=1)
+    prune_every = 100
+    # Log ids are taken before the writer commits, so a row can become
+    # visible after a higher id; ids this close to the newest seen are read
+    # again on the next sync
+    overlap = 100
+
+    # table: the cache_invalidations table; interval: seconds between syncs,
+    # 0 turns the log off (a single process)
+    def __init__(self, session, table, interval=1.0, clock=time.monotonic):
+        self.session = session
+        self.table = table
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_id = None
+        self._seen = set()
+        self._synced_at = None
+        self._records = 0
+
+    # Records a change after the write that made it has committed, and
+    # commits the record. keys=None means everything of that kind.
+    def record(self, kind, keys=None):
+        if not self.interval:
+            return
+        keys = None if keys is None else [str(key) for key in keys]
+        if keys is None or len(keys) > self.max_keys:
+            keys = ['*']
+        self.session.execute(insert(self.table), [{'kind': kind, 'key': key} for key in keys or ['']])
+        with self._lock:
+            self._records += 1
+            prune = self._records % self.prune_every == 0
+        if prune:
+            cutoff = self.session.execute(select(func.now())).scalar() - self.retention
+            self.session.execute(delete(self.table).where(self.table.c.created_at < cutoff))
+        self.session.commit()
+
+    # Applies the rows recorded since the last sync. force skips the
+    # interval, e.g. for the nginx refetch that follows a write.
+    def sync(self, force=False):
+        if not self.interval:
+            return
+        now = self._clock()
+        with self._lock:
+            if not force and self._synced_at is not None and now - self._synced_at < self.interval:
+                return
+            behind = self._synced_at is not None and now - self._synced_at > self.retention.total_seconds()
+            self._synced_at = now
+            last_id = self._last_id
+
+        if last_id is None:
+            # Nothing is cached yet, so only the position matters
+            newest = self.session.execute(select(func.max(self.table.c.id))).scalar()
+            with self._lock:
+                self._last_id = newest or 0
+            return
+
+        table = self.table
+        rows = self.session.execute(
+            select(table.c.id, table.c.kind, table.c.key)
+            .where(table.c.id > last_id - self.overlap)
+            .order_by(table.c.id)
+        ).all()
+        with self._lock:
+            rows = [row for row in rows if row.id not in self._seen]
+            if rows:
+                self._last_id = max(self._last_id, rows[-1].id)
+            self._seen.update(row.id for row in rows)
+            self._seen = {seen for seen in self._seen if seen > self._last_id - self.overlap}
+
+        changed = {}
+        for _, kind, key in rows:
+            changed.setdefault(kind, set()).add(key)
+        for kind, handler in INVALIDATION_HANDLERS.items():
+            keys = changed.get(kind)
+            if behind or (keys and '*' in keys):
+                handler(None)
+            elif keys:
+                handler(sorted(key for key in keys if key))
+
+
+# before_request hook; the edge cache's refetches (X-Cache-Refresh) must
+# not be answered from a copy another worker has already invalidated
+def sync_invalidations():
+    current_app.extensions['cache_invalidations'].sync(force='X-Cache-Refresh' in request.headers)
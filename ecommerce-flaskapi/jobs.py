@@ -0,0 +1,182 @@
+# Background jobs for heavy writes, queued in the jobs table
+#
+# Writes that cascade through many rows (deleting many products, deleting a
+# user with their orders, bulk order imports) check their input in the
+# request, queue a job and answer 202 with its id. GET /jobs/<id> reports its
+# progress. The jobs run in a separate process:
+#   flask --app app run-jobs
+# Each handler is a generator that yields after every chunk of work. The
+# runner commits the chunk together with the job's progress, so no
+# transaction holds row locks for long, and a job picked up again after a
+# crash carries on from its last committed chunk.
+#
+# The table is the queue, so there is no broker to run. Workers claim a job
+# with a conditional UPDATE, so any number of them can share the table.
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+import click
+from flask import Blueprint, current_app, jsonify, url_for
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, update
+
+from extensions import db
+from models import Job
+from order_totals import database_now
+
+logger = logging.getLogger(__name__)
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# kind -> handler(job), registered by the blueprints with @job_handler(kind)
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+# ----- Queueing -----
+
+# Adds a queued job to the session; the caller commits it with its own writes
+def enqueue_job(kind, payload, total=0):
+    job = Job(kind=kind, payload=payload, total=total, status='queued')
+    db.session.add(job)
+    return job
+
+# 202 for a committed job, pointing at its status
+def job_accepted_response(job, message):
+    status_url = url_for('jobs.get_job', id=job.id)
+    response = jsonify({'message': message, 'job_id': job.id, 'status': job.status, 'status_url': status_url})
+    response.headers['Location'] = status_url
+    return response, 202
+
+def job_status_payload(job):
+    def timestamp(value):
+        return value.isoformat() if value else None
+
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'result': job.result,
+        'error': job.error,
+        'attempts': job.attempts,
+        'created_at': timestamp(job.created_at),
+        'started_at': timestamp(job.started_at),
+        'finished_at': timestamp(job.finished_at),
+    }
+
+
+# ----- Running -----
+
+# Claims the oldest queued job, or failing that a running one whose worker
+# stopped sending heartbeats. Returns the job or None.
+def claim_job():
+    now = database_now()
+    stalled = (Job.status == 'running', Job.heartbeat_at < now - timedelta(seconds=current_app.config['JOB_STALE_AFTER']))
+    # A job whose worker died on every attempt is given up on
+    db.session.execute(
+        update(Job)
+        .where(*stalled, Job.attempts >= current_app.config['JOB_MAX_ATTEMPTS'])
+        .values(status='failed', error='The worker running this job stopped responding', finished_at=now)
+    )
+    for condition in ((Job.status == 'queued',), stalled):
+        while True:
+            job_id = db.session.execute(
+                select(Job.id).where(*condition).order_by(Job.id).limit(1)
+            ).scalar()
+            if job_id is None:
+                break
+            # Another worker may have claimed it since the select
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, *condition)
+                .values(
+                    status='running',
+                    attempts=Job.attempts + 1,
+                    started_at=func.coalesce(Job.started_at, now),
+                    heartbeat_at=now
+                )
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+    db.session.commit()
+    return None
+
+def finish_job(job, status, error=None):
+    job.status = status
+    job.error = error
+    job.finished_at = database_now()
+    db.session.commit()
+
+# Runs a claimed job to the end, committing each chunk with the job's progress
+def run_job(job):
+    handler = JOB_HANDLERS.get(job.kind)
+    if handler is None:
+        finish_job(job, 'failed', f'Unknown job kind: {job.kind}')
+        return
+
+    try:
+        for done in handler(job):
+            job.progress += done
+            job.heartbeat_at = database_now()
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Job %s (%s) failed on attempt %s', job.id, job.kind, job.attempts)
+        # Committed chunks stay done; a retry carries on after them
+        if job.attempts < current_app.config['JOB_MAX_ATTEMPTS']:
+            job.status = 'queued'
+            job.error = str(e)
+            db.session.commit()
+        else:
+            finish_job(job, 'failed', str(e))
+        return
+
+    finish_job(job, 'succeeded')
+
+# Returns False when the queue was empty
+def run_next_job():
+    job = claim_job()
+    if job is None:
+        return False
+    logger.info('Running job %s (%s), attempt %s', job.id, job.kind, job.attempts)
+    run_job(job)
+    return True
+
+@click.command('run-jobs', help='Run queued background jobs (deletes, bulk imports) until stopped')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty instead of polling')
+@with_appcontext
+def run_jobs_command(once):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    logger.info('Job worker %s:%s started', socket.gethostname(), os.getpid())
+    while True:
+        if run_next_job():
+            continue
+        if once:
+            break
+        # Don't keep a connection checked out while idle
+        db.session.remove()
+        time.sleep(current_app.config['JOB_POLL_INTERVAL'])
+
+
+# ----- Job Endpoints -----
+
+# Status, progress and result of a background job
+@jobs_bp.route('/jobs/<int:id>', methods=['GET'])
+def get_job(id):
+    job = db.session.get(Job, id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+
+    return jsonify(job_status_payload(job)), 200
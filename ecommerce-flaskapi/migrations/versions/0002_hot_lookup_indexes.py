@@ -0,0 +1,39 @@
+"""indexes for hot lookup columns
+
+- orders.order_date for the /orders/filter BETWEEN range scan
+- orders (user_id, order_date) for a user's orders and per-user stats
+- order_product (product_id, order_id) for product -> orders lookups;
+  the composite PK only serves the order -> products direction
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 22:03:12.518904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_order_date', ['order_date'], unique=False)
+        batch_op.create_index('ix_orders_user_id_order_date', ['user_id', 'order_date'], unique=False)
+
+    with op.batch_alter_table('order_product', schema=None) as batch_op:
+        batch_op.create_index('ix_order_product_product_id_order_id', ['product_id', 'order_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_product', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_product_product_id_order_id')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_user_id_order_date')
+        batch_op.drop_index('ix_orders_order_date')
@@ -0,0 +1,29 @@
+"""fulltext index on product names for /products/search
+
+- products.product_name FULLTEXT on MySQL (boolean-mode prefix search);
+  other databases get a plain index and search in memory instead
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 23:41:05.227310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_product_name_fulltext', ['product_name'], unique=False, mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_product_name_fulltext')
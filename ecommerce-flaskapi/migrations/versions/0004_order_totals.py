@@ -0,0 +1,67 @@
+"""stored order totals and per-user order summaries
+
+- order_product.unit_price: the product's price when it was added to the
+  order, so later price changes don't rewrite order totals
+- orders.total_price / item_count, kept current by the order endpoints
+- user_order_summaries: running order count and spend per user
+
+Existing line items are priced at today's product price, then totals and
+summaries are computed from them (same as flask --app app rebuild-order-totals).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:12:44.630518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order_product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('unit_price', sa.Double(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_price', sa.Double(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('user_order_summaries',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('total_spent', sa.Double(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    op.execute(
+        'UPDATE order_product SET unit_price = '
+        '(SELECT products.price FROM products WHERE products.id = order_product.product_id)'
+    )
+    op.execute(
+        'UPDATE orders SET '
+        'item_count = (SELECT COUNT(*) FROM order_product WHERE order_product.order_id = orders.id), '
+        'total_price = (SELECT ROUND(COALESCE(SUM(order_product.unit_price), 0), 2) '
+        'FROM order_product WHERE order_product.order_id = orders.id)'
+    )
+    op.execute(
+        'INSERT INTO user_order_summaries (user_id, order_count, total_spent) '
+        'SELECT user_id, COUNT(*), ROUND(SUM(total_price), 2) FROM orders GROUP BY user_id'
+    )
+
+
+def downgrade():
+    op.drop_table('user_order_summaries')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('item_count')
+        batch_op.drop_column('total_price')
+
+    with op.batch_alter_table('order_product', schema=None) as batch_op:
+        batch_op.drop_column('unit_price')
@@ -0,0 +1,58 @@
+"""sales rollups for /analytics
+
+- daily_sales: orders, units and revenue per calendar day of order_date
+- product_sales: units and revenue per product, indexed by revenue
+
+Both are kept current by the order endpoints and filled here from the
+existing orders (same as flask --app app rebuild-order-totals).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 14:03:27.918204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_sales',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Double(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('product_sales',
+    sa.Column('product_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Double(), nullable=False),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    with op.batch_alter_table('product_sales', schema=None) as batch_op:
+        batch_op.create_index('ix_product_sales_revenue', ['revenue'], unique=False)
+
+    op.execute(
+        'INSERT INTO daily_sales (day, order_count, units, revenue) '
+        'SELECT DATE(order_date), COUNT(*), SUM(item_count), ROUND(SUM(total_price), 2) '
+        'FROM orders GROUP BY DATE(order_date)'
+    )
+    op.execute(
+        'INSERT INTO product_sales (product_id, units, revenue) '
+        'SELECT product_id, COUNT(*), ROUND(SUM(unit_price), 2) FROM order_product GROUP BY product_id'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('product_sales', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_sales_revenue')
+
+    op.drop_table('product_sales')
+    op.drop_table('daily_sales')
@@ -0,0 +1,31 @@
+"""line item quantities
+
+- order_product.quantity: units of the product in the order
+
+Existing line items get quantity 1, which is what they stood for, so the
+stored totals and sales rollups are already correct and are left alone.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 10:21:05.471932
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order_product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('order_product', schema=None) as batch_op:
+        batch_op.drop_column('quantity')
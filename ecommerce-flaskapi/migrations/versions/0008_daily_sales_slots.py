@@ -0,0 +1,56 @@
+"""spread daily_sales over slot rows
+
+- daily_sales.slot: each day's sales are split over DAILY_SALES_SLOTS rows,
+  keyed (day, slot), so concurrent order writes don't all update one row
+
+The table only holds sums, so it is recreated and refilled from the orders
+into slot 0 (same as flask --app app rebuild-order-totals) rather than
+altering its primary key in place.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-20 09:12:44.610375
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_table('daily_sales')
+    op.create_table('daily_sales',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('slot', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Double(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'slot')
+    )
+    op.execute(
+        'INSERT INTO daily_sales (day, slot, order_count, units, revenue) '
+        'SELECT DATE(order_date), 0, COUNT(*), SUM(item_count), ROUND(SUM(total_price), 2) '
+        'FROM orders GROUP BY DATE(order_date)'
+    )
+
+
+def downgrade():
+    op.drop_table('daily_sales')
+    op.create_table('daily_sales',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Double(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.execute(
+        'INSERT INTO daily_sales (day, order_count, units, revenue) '
+        'SELECT DATE(order_date), COUNT(*), SUM(item_count), ROUND(SUM(total_price), 2) '
+        'FROM orders GROUP BY DATE(order_date)'
+    )
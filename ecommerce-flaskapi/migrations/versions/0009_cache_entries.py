@@ -0,0 +1,37 @@
+"""database cache backend
+
+- cache_entries: key/value entries of cache.DatabaseCache, shared by every
+  worker (the token denylist by default)
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-21 10:05:31.284913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_entries',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('value', sa.JSON(), nullable=False),
+    sa.Column('expires_at', sa.Double(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('cache_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_cache_entries_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cache_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_cache_entries_expires_at')
+
+    op.drop_table('cache_entries')
@@ -0,0 +1,38 @@
+"""cache invalidation log
+
+- cache_invalidations: what each write changed, read by every worker to
+  drop those entries from its own caches (invalidations.InvalidationLog)
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-21 14:42:08.519305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_invalidations',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=64), server_default='', nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('cache_invalidations', schema=None) as batch_op:
+        batch_op.create_index('ix_cache_invalidations_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cache_invalidations', schema=None) as batch_op:
+        batch_op.drop_index('ix_cache_invalidations_created_at')
+
+    op.drop_table('cache_invalidations')
@@ -0,0 +1,30 @@
+"""users pending deletion
+
+- users.deleted_at: set when DELETE /users/<id> queues the account's
+  deletion, so the user can't log in or refresh a token until the job
+  removes the row
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-21 16:13:47.062118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('deleted_at')
@@ -0,0 +1,161 @@
+# Database models
+#
+# Schema changes go through versioned migrations (migrations/), run with:
+#   flask --app app db upgrade
+from datetime import date, datetime
+from typing import List
+
+from sqlalchemy import ForeignKey, Table, String, Text, JSON, Column, Date, DateTime, Double, Index, Integer, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from extensions import Base
+
+# Association Table for Many-to-Many relationship between Orders and Products
+# One line per product in an order (composite primary key); buying more of a
+# product raises the line's quantity
+order_product = Table(
+    'order_product',
+    Base.metadata,
+    Column('order_id', ForeignKey('orders.id'), primary_key=True),
+    Column('product_id', ForeignKey('products.id'), primary_key=True),
+    # Price when the product was added, so later price changes leave the order alone
+    Column('unit_price', Double, nullable=False, server_default='0'),
+    Column('quantity', Integer, nullable=False, server_default='1'),
+    # The PK covers order -> products; this covers product -> orders
+    Index('ix_order_product_product_id_order_id', 'product_id', 'order_id')
+)
+
+class User(Base):
+    __tablename__ = 'users'
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), nullable=False)
+    address: Mapped[str] = mapped_column(String(100))
+    email: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    password: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Set when the account's deletion is queued (delete_user_job); from then
+    # on the user can't log in or refresh a token
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    # One-to-Many relationship with Orders
+    orders: Mapped[List['Order']] = relationship('Order', back_populates='user')
+
+class Order(Base):
+    __tablename__ = 'orders'
+    id: Mapped[int] = mapped_column(primary_key=True)
+    order_date: Mapped[DateTime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
+    # Sum and count of the line items, kept current by every order write
+    total_price: Mapped[float] = mapped_column(Double, nullable=False, default=0, server_default='0')
+    item_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default='0')
+
+    # Many-to-One relationship with User
+    user: Mapped['User'] = relationship('User', back_populates='orders')
+    # Many-to-Many relationship with Products
+    products: Mapped[List['Product']] = relationship(secondary=order_product, back_populates='orders')
+
+    __table_args__ = (
+        # Date range filters (BETWEEN) and a user's orders, newest first
+        Index('ix_orders_order_date', 'order_date'),
+        Index('ix_orders_user_id_order_date', 'user_id', 'order_date'),
+    )
+
+class Product(Base):
+    __tablename__ = 'products'
+    id: Mapped[int] = mapped_column(primary_key=True)
+    product_name: Mapped[str] = mapped_column(String(100))
+    price: Mapped[float] = mapped_column(nullable=False)
+
+    # FULLTEXT on MySQL for /products/search; a plain index elsewhere
+    __table_args__ = (
+        Index('ix_products_product_name_fulltext', 'product_name', mysql_prefix='FULLTEXT'),
+    )
+
+    # Many-to-Many relationship with Orders
+    orders: Mapped[List['Order']] = relationship(secondary=order_product, back_populates='products')
+
+# Running order count and spend per user, kept current by every order write
+class UserOrderSummary(Base):
+    __tablename__ = 'user_order_summaries'
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'), primary_key=True)
+    order_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    total_spent: Mapped[float] = mapped_column(Double, nullable=False, default=0)
+
+# Sales rollups for /analytics, kept current by every order write: rows
+# per calendar day of order_date, and one per product
+class DailySales(Base):
+    __tablename__ = 'daily_sales'
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    # Each order write adds to one of DAILY_SALES_SLOTS rows for the day,
+    # picked at random, so concurrent writes rarely wait on the same row
+    # lock; reads sum the day's rows
+    slot: Mapped[int] = mapped_column(primary_key=True, autoincrement=False, default=0)
+    order_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    units: Mapped[int] = mapped_column(nullable=False, default=0)
+    revenue: Mapped[float] = mapped_column(Double, nullable=False, default=0)
+
+class ProductSales(Base):
+    __tablename__ = 'product_sales'
+    # No foreign key: a deleted product's row just drops out of the join
+    product_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    units: Mapped[int] = mapped_column(nullable=False, default=0)
+    revenue: Mapped[float] = mapped_column(Double, nullable=False, default=0)
+
+    __table_args__ = (
+        # Top products by revenue is an index walk, not a sort
+        Index('ix_product_sales_revenue', 'revenue'),
+    )
+
+# Background jobs (jobs.py): queued by the endpoints, run by `flask run-jobs`
+class Job(Base):
+    __tablename__ = 'jobs'
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    # queued -> running -> succeeded / failed
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default='queued', server_default='queued')
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    result: Mapped[dict] = mapped_column(JSON, nullable=True)
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    # Units of work done (committed) out of total, e.g. products deleted
+    progress: Mapped[int] = mapped_column(nullable=False, default=0, server_default='0')
+    total: Mapped[int] = mapped_column(nullable=False, default=0, server_default='0')
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0, server_default='0')
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # Bumped with every committed chunk; a running job whose heartbeat stops
+    # (the worker died) is taken over by another worker
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Workers claim the oldest queued job
+        Index('ix_jobs_status_id', 'status', 'id'),
+    )
+
+# Entries of the database cache backend (cache.DatabaseCache), shared by
+# every worker, e.g. the token denylist
+class CacheEntry(Base):
+    __tablename__ = 'cache_entries'
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    value: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # Unix time the entry stops counting; NULL never expires
+    expires_at: Mapped[float] = mapped_column(Double, nullable=True)
+
+    __table_args__ = (
+        # Pruning expired entries
+        Index('ix_cache_entries_expires_at', 'expires_at'),
+    )
+
+# What a write changed, for the other processes' caches to drop
+# (invalidations.InvalidationLog); rows are kept for an hour
+class CacheInvalidation(Base):
+    __tablename__ = 'cache_invalidations'
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # What changed, e.g. 'products', and its key ('*' for everything)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    key: Mapped[str] = mapped_column(String(64), nullable=False, default='', server_default='')
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        # Pruning old rows
+        Index('ix_cache_invalidations_created_at', 'created_at'),
+    )
@@ -0,0 +1,221 @@
+# Order totals, user order summaries and sales rollups
+#
+# Everything derived from order_product follows every change to it:
+#   - orders.total_price / item_count
+#   - user_order_summaries (order count, total spent)
+#   - daily_sales and product_sales (the /analytics rollups)
+# The writes are relative (x = x + delta), so concurrent requests never
+# lose each other's changes, and reads are primary key or index lookups.
+# Rebuild everything from the line items with:
+#   flask --app app rebuild-order-totals
+import random
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, delete, func, insert, literal, select, tuple_, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import Order, UserOrderSummary, DailySales, ProductSales, order_product
+
+
+# INSERT ... ON DUPLICATE KEY UPDATE on MySQL, ON CONFLICT DO UPDATE elsewhere.
+# set_values(new) returns the columns to update on a key clash, where new is
+# the row that failed to insert (VALUES() / excluded).
+def upsert_statement(table, set_values):
+    if db.engine.dialect.name in ('mysql', 'mariadb'):
+        statement = mysql_insert(table)
+        return statement.on_duplicate_key_update(set_values(statement.inserted))
+    statement = sqlite_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(table.primary_key), set_=set_values(statement.excluded)
+    )
+
+
+# Sum (key, (a, b, ...)) changes that hit the same key
+def merge_deltas(*changes):
+    merged = {}
+    for key, values in changes:
+        old = merged.get(key)
+        merged[key] = values if old is None else tuple(x + y for x, y in zip(old, values))
+    return {key: values for key, values in merged.items() if any(values)}
+
+# deltas: {order_id: (item count change, price change)}
+def adjust_order_totals(deltas):
+    orders = Order.__table__
+    rows = [{'order_id': order_id, 'items': items, 'amount': amount} for order_id, (items, amount) in deltas.items()]
+    if rows:
+        db.session.execute(
+            update(orders)
+            .where(orders.c.id == bindparam('order_id'))
+            .values(
+                item_count=orders.c.item_count + bindparam('items'),
+                total_price=func.round(orders.c.total_price + bindparam('amount'), 2)
+            ),
+            rows
+        )
+
+# Adds each delta row to the existing row with the same key, creating
+# missing rows; amount columns are rounded to cents
+def add_to_rollup(table, rows, amount_columns=()):
+    if rows:
+        db.session.execute(upsert_statement(table, lambda new: {
+            name: func.round(table.c[name] + new[name], 2) if name in amount_columns else table.c[name] + new[name]
+            for name in rows[0] if name not in table.primary_key.columns
+        }), rows)
+
+# deltas: {user_id: (order count change, spend change)}
+def adjust_user_order_summaries(deltas):
+    add_to_rollup(UserOrderSummary.__table__, [
+        {'user_id': user_id, 'order_count': count, 'total_spent': amount}
+        for user_id, (count, amount) in deltas.items()
+    ], amount_columns=('total_spent',))
+
+# deltas: {day: (order count change, units change, revenue change)}
+# Every request writes to a random slot row of each day (see DailySales)
+def adjust_daily_sales(deltas):
+    slot = random.randrange(current_app.config['DAILY_SALES_SLOTS'])
+    add_to_rollup(DailySales.__table__, [
+        {'day': day, 'slot': slot, 'order_count': count, 'units': units, 'revenue': revenue}
+        for day, (count, units, revenue) in deltas.items()
+    ], amount_columns=('revenue',))
+
+# deltas: {product_id: (units change, revenue change)}
+def adjust_product_sales(deltas):
+    add_to_rollup(ProductSales.__table__, [
+        {'product_id': product_id, 'units': units, 'revenue': revenue}
+        for product_id, (units, revenue) in deltas.items()
+    ], amount_columns=('revenue',))
+
+# Record line items added (units > 0) or removed (units < 0), as
+# (order_id, user_id, order_date, product_id, units, amount), where amount
+# is units * the line's unit_price, and orders
+# created (+1) or deleted (-1), as (user_id, order_date, change)
+def record_sales(lines=(), orders=()):
+    lines, orders = list(lines), list(orders)
+    adjust_order_totals(merge_deltas(*((o, (n, a)) for o, _, _, _, n, a in lines)))
+    adjust_user_order_summaries(merge_deltas(
+        *((u, (c, 0)) for u, _, c in orders),
+        *((u, (0, a)) for _, u, _, _, _, a in lines)
+    ))
+    adjust_daily_sales(merge_deltas(
+        *((d.date(), (c, 0, 0)) for _, d, c in orders),
+        *((d.date(), (0, n, a)) for _, _, d, _, n, a in lines)
+    ))
+    adjust_product_sales(merge_deltas(*((p, (n, a)) for _, _, _, p, n, a in lines)))
+
+# New orders get the database's clock, same as the order_date server default,
+# but known up front so the daily rollup can be updated in the same request
+def database_now():
+    return db.session.execute(select(func.now())).scalar()
+
+# Take products' line items out of the orders that hold them, keeping every
+# total in step; used when products are deleted. With limit, at most that
+# many lines are taken out. Returns the number of lines removed.
+def remove_products_from_orders(product_ids, limit=None):
+    query = (
+        select(
+            order_product.c.order_id,
+            Order.user_id,
+            Order.order_date,
+            order_product.c.product_id,
+            order_product.c.quantity,
+            order_product.c.unit_price
+        )
+        .join(Order, Order.id == order_product.c.order_id)
+        .where(order_product.c.product_id.in_(product_ids))
+    )
+    if limit is not None:
+        query = query.order_by(order_product.c.product_id, order_product.c.order_id).limit(limit)
+    lines = db.session.execute(query).all()
+    if not lines:
+        return 0
+
+    if limit is None:
+        db.session.execute(delete(order_product).where(order_product.c.product_id.in_(product_ids)))
+    else:
+        db.session.execute(delete(order_product).where(
+            tuple_(order_product.c.order_id, order_product.c.product_id).in_([(line[0], line[3]) for line in lines])
+        ))
+    record_sales(
+        (order_id, user_id, order_date, product_id, -quantity, -quantity * unit_price)
+        for order_id, user_id, order_date, product_id, quantity, unit_price in lines
+    )
+    return len(lines)
+
+# Drop deleted products' sales rollup rows. Taking their lines out leaves
+# them at zero, and a rebuild has no row for them at all.
+def delete_product_sales(product_ids):
+    db.session.execute(delete(ProductSales).where(ProductSales.product_id.in_(product_ids)))
+
+# Delete orders and their line items, keeping every total in step
+def delete_orders(order_ids):
+    lines = db.session.execute(
+        select(
+            order_product.c.order_id,
+            Order.user_id,
+            Order.order_date,
+            order_product.c.product_id,
+            order_product.c.quantity,
+            order_product.c.unit_price
+        )
+        .join(Order, Order.id == order_product.c.order_id)
+        .where(order_product.c.order_id.in_(order_ids))
+    ).all()
+    orders = db.session.execute(select(Order.user_id, Order.order_date).where(Order.id.in_(order_ids))).all()
+
+    db.session.execute(delete(order_product).where(order_product.c.order_id.in_(order_ids)))
+    record_sales(
+        lines=(
+            (order_id, user_id, order_date, product_id, -quantity, -quantity * unit_price)
+            for order_id, user_id, order_date, product_id, quantity, unit_price in lines
+        ),
+        orders=((user_id, order_date, -1) for user_id, order_date in orders)
+    )
+    db.session.execute(delete(Order).where(Order.id.in_(order_ids)))
+
+# Recompute order totals, user summaries and sales rollups from the line items
+def rebuild_order_totals():
+    orders = Order.__table__
+    summaries = UserOrderSummary.__table__
+    daily = DailySales.__table__
+    products = ProductSales.__table__
+
+    in_order = order_product.c.order_id == orders.c.id
+    line_amount = order_product.c.quantity * order_product.c.unit_price
+    db.session.execute(update(orders).values(
+        item_count=select(func.coalesce(func.sum(order_product.c.quantity), 0)).where(in_order).scalar_subquery(),
+        total_price=select(func.round(func.coalesce(func.sum(line_amount), 0), 2))
+        .where(in_order).scalar_subquery()
+    ))
+
+    for table in (summaries, daily, products):
+        db.session.execute(delete(table))
+    db.session.execute(insert(summaries).from_select(
+        ['user_id', 'order_count', 'total_spent'],
+        select(orders.c.user_id, func.count(), func.round(func.sum(orders.c.total_price), 2))
+        .group_by(orders.c.user_id)
+    ))
+    order_day = func.date(orders.c.order_date)
+    db.session.execute(insert(daily).from_select(
+        ['day', 'slot', 'order_count', 'units', 'revenue'],
+        select(
+            order_day, literal(0), func.count(), func.sum(orders.c.item_count),
+            func.round(func.sum(orders.c.total_price), 2)
+        )
+        .group_by(order_day)
+    ))
+    db.session.execute(insert(products).from_select(
+        ['product_id', 'units', 'revenue'],
+        select(order_product.c.product_id, func.sum(order_product.c.quantity), func.round(func.sum(line_amount), 2))
+        .group_by(order_product.c.product_id)
+    ))
+    db.session.commit()
+
+@click.command('rebuild-order-totals', help='Recompute order totals, user order stats and sales rollups from order_product')
+@with_appcontext
+def rebuild_order_totals_command():
+    rebuild_order_totals()
+    print('Order totals, user order stats and sales rollups rebuilt')
@@ -0,0 +1,816 @@
+# Order endpoints, order stats, sales analytics and order export
+from datetime import date, datetime
+
+from flask import Blueprint, current_app, request, jsonify
+from marshmallow import ValidationError
+from sqlalchemy import bindparam, func, select, insert, delete, update
+
+from etags import make_etag, conditional_response
+from jobs import enqueue_job, job_accepted_response, job_handler
+from exports import stream_export
+from extensions import db
+from models import User, Product, Order, UserOrderSummary, DailySales, ProductSales, order_product
+from order_totals import adjust_user_order_summaries, database_now, merge_deltas, record_sales, upsert_statement
+from products import valid_product_id_list
+from schemas import order_schema, order_rows, product_rows, user_rows
+
+orders_bp = Blueprint('orders', __name__)
+
+
+# ----- Order Expansion -----
+# Order reads accept ?expand=products,total so a client can get an order
+# history in one request instead of one /products and /total call per order
+
+ORDER_EXPANSIONS = ('products', 'total')
+
+# Returns (expansions, None) or (None, error response)
+def parse_order_expand():
+    expand = [name for name in request.args.get('expand', '').split(',') if name]
+    unknown = [name for name in expand if name not in ORDER_EXPANSIONS]
+    if unknown:
+        return None, (jsonify({'message': f'expand must be a comma separated list of: {", ".join(ORDER_EXPANSIONS)}'}), 400)
+    return expand, None
+
+# Same body as GET /orders/<id>/total
+def order_total_payload(order_id, total, product_count):
+    return {
+        'order_id': order_id,
+        'total_price': round(float(total), 2),
+        'product_count': product_count
+    }
+
+# Products of many orders at once, each row tagged with its order_id;
+# order_ids is a list or a select of order IDs
+def order_products_query(order_ids):
+    return (
+        select(*product_rows.columns, order_product.c.quantity, order_product.c.unit_price, order_product.c.order_id)
+        .join(order_product, order_product.c.product_id == Product.id)
+        .where(order_product.c.order_id.in_(order_ids))
+        .order_by(order_product.c.order_id, Product.id)
+    )
+
+# Product rows that end with their line's quantity and unit_price, dumped
+# as products with those two fields added
+def dump_line_items(rows):
+    return [
+        dict(product, quantity=row.quantity, unit_price=row.unit_price)
+        for product, row in zip(product_rows.dump(rows), rows)
+    ]
+
+# Adds the expansions to serialized orders. order_ids selects the same
+# orders, so every order's products come from one query
+def expand_orders(orders, expand, order_ids):
+    if 'products' in expand:
+        products = {order['id']: [] for order in orders}
+        if products:
+            # An order created since the orders were read is simply left out
+            for row in db.session.execute(order_products_query(order_ids)):
+                products.setdefault(row.order_id, []).append(row)
+        for order in orders:
+            order['products'] = dump_line_items(products[order['id']])
+
+    # Totals are stored on the order, so this costs no query
+    if 'total' in expand:
+        for order in orders:
+            order['total'] = order_total_payload(order['id'], order['total_price'], order['item_count'])
+    return orders
+
+# Serialize order rows from query, with any expansions
+def dump_orders(query, rows, expand):
+    orders = order_rows.dump(rows)
+    if expand:
+        expand_orders(orders, expand, query.with_only_columns(Order.id))
+    return orders
+
+
+# ----- Order Endpoints -----
+
+# Look up every requested product ID with a single IN query
+# Returns {id: current price} in request order (de-duplicated) and the IDs
+# that don't exist
+def resolve_product_prices(product_ids):
+    product_ids = list(dict.fromkeys(product_ids))
+    found = dict(db.session.execute(
+        select(Product.id, Product.price).where(Product.id.in_(product_ids))
+    ).all())
+    return {i: found[i] for i in product_ids if i in found}, [i for i in product_ids if i not in found]
+
+def missing_products_response(missing):
+    return jsonify({
+        'message': f'Products not found: {", ".join(str(i) for i in missing)}',
+        'missing_product_ids': missing
+    }), 404
+
+def valid_quantity(quantity):
+    return (
+        isinstance(quantity, int) and not isinstance(quantity, bool)
+        and 1 <= quantity <= current_app.config['ORDER_LINE_MAX_QUANTITY']
+    )
+
+def quantity_message():
+    return f'quantity must be an integer from 1 to {current_app.config["ORDER_LINE_MAX_QUANTITY"]}'
+
+# ?quantity= on the single line endpoints
+# Returns (quantity, None), (default, None) when absent, or (None, error response)
+def parse_quantity(default):
+    raw = request.args.get('quantity')
+    if raw is None:
+        return default, None
+    try:
+        quantity = int(raw)
+    except ValueError:
+        quantity = None
+    if not valid_quantity(quantity):
+        return None, (jsonify({'message': quantity_message()}), 400)
+    return quantity, None
+
+# Line items from an order body, as {product_id: quantity} in request order:
+#   "items": [{"product_id": 1, "quantity": 2}, ...]  repeated products add up
+#   "product_ids": [1, 2, 3]                          one of each
+# Returns (items, None), (None, None) when the body has neither, or
+# (None, error message)
+def parse_line_items(data):
+    items = data.get('items')
+    if items is None:
+        product_ids = data.get('product_ids')
+        if product_ids is None:
+            return None, None
+        if not valid_product_id_list(product_ids):
+            return None, 'product_ids must be a list of integers'
+        return dict.fromkeys(product_ids, 1), None
+
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return None, 'items must be a list of objects with a product_id and a quantity'
+    quantities = {}
+    for item in items:
+        product_id, quantity = item.get('product_id'), item.get('quantity', 1)
+        if not valid_product_id_list([product_id]):
+            return None, 'Every item needs an integer product_id'
+        if not valid_quantity(quantity):
+            return None, quantity_message()
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if not valid_quantity(quantities[product_id]):
+            return None, quantity_message()
+    return quantities, None
+
+# Write all order_product rows in one executemany
+def insert_order_products(rows):
+    if rows:
+        db.session.execute(insert(order_product), rows)
+
+# Create a new order
+@orders_bp.route('/orders', methods=['POST'])
+def create_order():
+    try:
+        order_data = order_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    # Verify user exists
+    user = db.session.get(User, order_data['user_id'])
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+
+    quantities, error = parse_line_items(request.json)
+    if error:
+        return jsonify({'message': error}), 400
+
+    if not quantities:
+        return jsonify({'message': 'At least one product ID is required'}), 400
+
+    # Verify all products in one query and report every missing ID
+    prices, missing = resolve_product_prices(quantities)
+    if missing:
+        return missing_products_response(missing)
+
+    new_order = Order(user_id=order_data['user_id'], order_date=database_now())
+    db.session.add(new_order)
+    db.session.flush()  # Assigns new_order.id for the association rows
+
+    insert_order_products([
+        {'order_id': new_order.id, 'product_id': i, 'unit_price': price, 'quantity': quantities[i]}
+        for i, price in prices.items()
+    ])
+    record_sales(
+        lines=(
+            (new_order.id, new_order.user_id, new_order.order_date, i, quantities[i], quantities[i] * price)
+            for i, price in prices.items()
+        ),
+        orders=[(new_order.user_id, new_order.order_date, 1)]
+    )
+    db.session.commit()
+
+    return order_schema.jsonify(new_order), 201
+
+# Looks up every user and product that order rows reference, one query each
+# rows: (index, user_id, {product_id: quantity})
+# Returns ({product_id: price}, {index: errors}) for the rows that can't be written
+def check_order_rows(rows):
+    user_ids = {user_id for _, user_id, _ in rows}
+    all_product_ids = {i for _, _, quantities in rows for i in quantities}
+    found_users = set(db.session.execute(
+        select(User.id).where(User.id.in_(user_ids))
+    ).scalars()) if user_ids else set()
+    found_products = dict(db.session.execute(
+        select(Product.id, Product.price).where(Product.id.in_(all_product_ids))
+    ).all()) if all_product_ids else {}
+
+    errors = {}
+    for index, user_id, quantities in rows:
+        row_errors = {}
+        if user_id not in found_users:
+            row_errors['user_id'] = ['User not found']
+        missing = [i for i in quantities if i not in found_products]
+        if missing:
+            row_errors['missing_product_ids'] = missing
+        if row_errors:
+            errors[index] = row_errors
+    return found_products, errors
+
+# Import many orders (marketplace sync)
+# Every row is checked first: if any is invalid, nothing is queued and the
+# errors are reported per row. The orders are then written by a background
+# job (202 + job id); see import_orders_job
+@orders_bp.route('/orders/bulk', methods=['POST'])
+def create_orders_bulk():
+    payload = request.json
+    if isinstance(payload, dict):
+        payload = payload.get('orders')
+
+    if not isinstance(payload, list) or not payload:
+        return jsonify({'message': 'Provide a non-empty list of orders'}), 400
+
+    if len(payload) > current_app.config['BULK_ORDER_LIMIT']:
+        return jsonify({'message': f'Cannot import more than {current_app.config["BULK_ORDER_LIMIT"]} orders at once'}), 400
+
+    errors = {}
+    loaded = []
+    for index, item in enumerate(payload):
+        try:
+            order_data = order_schema.load(item)
+        except ValidationError as err:
+            errors[index] = err.messages
+            continue
+
+        quantities, error = parse_line_items(item)
+        if error or not quantities:
+            field = 'items' if 'items' in item else 'product_ids'
+            errors[index] = {field: [error or 'A non-empty list of integer product IDs is required']}
+            continue
+
+        loaded.append((index, order_data, quantities))
+
+    _, row_errors = check_order_rows([(index, order_data['user_id'], quantities) for index, order_data, quantities in loaded])
+    errors.update(row_errors)
+    if errors:
+        return jsonify({'message': 'No orders were created', 'errors': errors}), 400
+
+    # Orders without an order_date are dated when the import was accepted
+    now = database_now()
+    job = enqueue_job('import_orders', {'orders': [
+        {
+            'user_id': order_data['user_id'],
+            'order_date': (order_data.get('order_date') or now).isoformat(),
+            'items': list(quantities.items())
+        }
+        for _, order_data, quantities in loaded
+    ]}, total=len(loaded))
+    db.session.commit()
+    return job_accepted_response(job, f'Importing {len(loaded)} orders')
+
+# Writes the orders JOB_BATCH_SIZE at a time, at the prices of the moment.
+# Users and products are looked up again for every chunk; an order whose
+# user or products were deleted after the request was checked is skipped.
+# result: {"order_ids": [...] in row order, "skipped": {row index: errors}}
+@job_handler('import_orders')
+def import_orders_job(job):
+    rows = job.payload['orders']
+    batch = current_app.config['JOB_BATCH_SIZE']
+    for start in range(job.progress, len(rows), batch):
+        part = rows[start:start + batch]
+        chunk = [
+            (index, row['user_id'], datetime.fromisoformat(row['order_date']), dict(row['items']))
+            for index, row in enumerate(part, start)
+        ]
+        prices, errors = check_order_rows([(index, user_id, quantities) for index, user_id, _, quantities in chunk])
+        chunk = [row for row in chunk if row[0] not in errors]
+
+        new_orders = [Order(user_id=user_id, order_date=order_date) for _, user_id, order_date, _ in chunk]
+        db.session.add_all(new_orders)
+        db.session.flush()
+
+        lines = [
+            (order.id, order.user_id, order.order_date, product_id, quantity, quantity * prices[product_id])
+            for order, (_, _, _, quantities) in zip(new_orders, chunk)
+            for product_id, quantity in quantities.items()
+        ]
+        insert_order_products([
+            {'order_id': order_id, 'product_id': product_id, 'unit_price': prices[product_id], 'quantity': quantity}
+            for order_id, _, _, product_id, quantity, _ in lines
+        ])
+        record_sales(lines=lines, orders=((order.user_id, order.order_date, 1) for order in new_orders))
+
+        result = job.result or {'order_ids': [], 'skipped': {}}
+        job.result = {
+            'order_ids': result['order_ids'] + [order.id for order in new_orders],
+            'skipped': {**result['skipped'], **{str(index): row_errors for index, row_errors in errors.items()}}
+        }
+        yield len(part)
+
+def line_item_key(order_id, product_id):
+    return (order_product.c.order_id == order_id, order_product.c.product_id == product_id)
+
+# Add ?quantity= units (default 1) of a product to an existing order
+# A product already in the order has its line's quantity raised, and the
+# added units keep the price the line was started at
+@orders_bp.route('/orders/<int:order_id>/add_product/<int:product_id>', methods=['PUT'])
+def add_product_to_order(order_id, product_id):
+    quantity, error = parse_quantity(1)
+    if error:
+        return error
+
+    order = db.session.get(Order, order_id)
+    if not order:
+        return jsonify({'message': 'Order not found'}), 404
+
+    price = db.session.execute(select(Product.price).where(Product.id == product_id)).scalar_one_or_none()
+    if price is None:
+        return jsonify({'message': 'Product not found'}), 404
+
+    # One INSERT ... ON DUPLICATE KEY UPDATE quantity = quantity + n, so two
+    # concurrent adds of the same product both count
+    db.session.execute(
+        upsert_statement(order_product, lambda new: {'quantity': order_product.c.quantity + new['quantity']}),
+        [{'order_id': order_id, 'product_id': product_id, 'unit_price': price, 'quantity': quantity}]
+    )
+    # The row is locked by the write above until commit, so the combined
+    # quantity read back is final
+    line = db.session.execute(
+        select(order_product.c.quantity, order_product.c.unit_price).where(*line_item_key(order_id, product_id))
+    ).one()
+    max_quantity = current_app.config['ORDER_LINE_MAX_QUANTITY']
+    if line.quantity > max_quantity:
+        db.session.rollback()
+        return jsonify({
+            'message': f'The order would have {line.quantity} of this product; a line can hold at most {max_quantity}'
+        }), 400
+    record_sales([(order_id, order.user_id, order.order_date, product_id, quantity, quantity * line.unit_price)])
+    db.session.commit()
+
+    return order_schema.jsonify(order), 200
+
+# Remove a product from an existing order, or only ?quantity= units of it
+@orders_bp.route('/orders/<int:order_id>/remove_product/<int:product_id>', methods=['DELETE'])
+def remove_product_from_order(order_id, product_id):
+    quantity, error = parse_quantity(None)
+    if error:
+        return error
+
+    order = db.session.get(Order, order_id)
+    if not order:
+        return jsonify({'message': 'Order not found'}), 404
+
+    line = db.session.execute(
+        select(order_product.c.quantity, order_product.c.unit_price)
+        .where(*line_item_key(order_id, product_id))
+        .with_for_update()
+    ).first()
+    if line is None:
+        return jsonify({'message': 'Product not found in order'}), 404
+
+    if quantity is None or quantity >= line.quantity:
+        quantity = line.quantity
+        db.session.execute(delete(order_product).where(*line_item_key(order_id, product_id)))
+    else:
+        db.session.execute(
+            update(order_product)
+            .where(*line_item_key(order_id, product_id))
+            .values(quantity=order_product.c.quantity - quantity)
+        )
+    # Take off the price it was added at, not today's price
+    record_sales([(order_id, order.user_id, order.order_date, product_id, -quantity, -quantity * line.unit_price)])
+    db.session.commit()
+
+    return order_schema.jsonify(order), 200
+
+# Retrieve all orders for a specific user
+@orders_bp.route('/orders/user/<int:user_id>', methods=['GET'])
+def get_orders_by_user(user_id):
+    expand, error = parse_order_expand()
+    if error:
+        return error
+
+    user = db.session.get(User, user_id)
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+
+    query = select(*order_rows.columns).where(Order.user_id == user_id)
+    orders = db.session.execute(query).all()
+    if not orders:
+        return jsonify({'message': 'No orders found for this user'}), 404
+
+    return jsonify(dump_orders(query, orders, expand)), 200
+
+# Get all products in a specific order
+@orders_bp.route('/orders/<int:order_id>/products', methods=['GET'])
+def get_products_in_order(order_id):
+    order = db.session.get(Order, order_id)
+    if not order:
+        return jsonify({'message': 'Order not found'}), 404
+
+    query = (
+        select(*product_rows.columns, order_product.c.quantity, order_product.c.unit_price)
+        .join(order_product, order_product.c.product_id == Product.id)
+        .where(order_product.c.order_id == order_id)
+    )
+    products = db.session.execute(query).all()
+    if not products:
+        return jsonify({'message': 'No products found in this order'}), 404
+
+    etag = make_etag([tuple(row) for row in products])
+    return conditional_response(etag, lambda: jsonify(dump_line_items(products)))
+
+# ----- Additional Order Endpoints -----
+
+# Retrieve all orders
+@orders_bp.route('/orders', methods=['GET'])
+def get_orders():
+    expand, error = parse_order_expand()
+    if error:
+        return error
+
+    query = select(*order_rows.columns)
+    orders = db.session.execute(query).all()
+    return jsonify(dump_orders(query, orders, expand)), 200
+
+# Retrieve an order by ID
+@orders_bp.route('/orders/<int:id>', methods=['GET'])
+def get_order(id):
+    expand, error = parse_order_expand()
+    if error:
+        return error
+
+    order = db.session.get(Order, id)
+    if not order:
+        return jsonify({'message': 'Order not found'}), 404
+
+    if not expand:
+        etag = make_etag(order.id, order.user_id, order.order_date, order.total_price, order.item_count)
+        return conditional_response(etag, lambda: order_schema.jsonify(order))
+
+    # The products are part of the body, so the tag is taken over all of it
+    payload = expand_orders([order_schema.dump(order)], expand, [order.id])[0]
+    return conditional_response(make_etag(payload), lambda: jsonify(payload))
+
+# Update an order (change user or products)
+@orders_bp.route('/orders/<int:id>', methods=['PUT'])
+def update_order(id):
+    order = db.session.get(Order, id)
+    if not order:
+        return jsonify({'message': 'Order not found'}), 404
+
+    try:
+        order_data = order_schema.load(request.json, partial=True)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    old_user_id, old_total = order.user_id, order.total_price
+
+    # Update user if provided
+    if 'user_id' in order_data:
+        user = db.session.get(User, order_data['user_id'])
+        if not user:
+            return jsonify({'message': 'User not found'}), 404
+        order.user_id = order_data['user_id']
+
+    # Update products if provided (items or product_ids): one IN lookup, then
+    # only the lines that changed are deleted / inserted / updated, so kept
+    # products keep their price
+    quantities, error = parse_line_items(request.json)
+    if error:
+        return jsonify({'message': error}), 400
+
+    if quantities is not None:
+        prices, missing = resolve_product_prices(quantities)
+        if missing:
+            return missing_products_response(missing)
+
+        current = {
+            product_id: (quantity, unit_price)
+            for product_id, quantity, unit_price in db.session.execute(
+                select(order_product.c.product_id, order_product.c.quantity, order_product.c.unit_price)
+                .where(order_product.c.order_id == order.id)
+            )
+        }
+        removed = [i for i in current if i not in quantities]
+        added = [i for i in quantities if i not in current]
+        changed = [i for i in quantities if i in current and quantities[i] != current[i][0]]
+        if removed:
+            db.session.execute(
+                delete(order_product)
+                .where(order_product.c.order_id == order.id, order_product.c.product_id.in_(removed))
+            )
+        insert_order_products([
+            {'order_id': order.id, 'product_id': i, 'unit_price': prices[i], 'quantity': quantities[i]} for i in added
+        ])
+        if changed:
+            db.session.execute(
+                update(order_product)
+                .where(order_product.c.order_id == order.id, order_product.c.product_id == bindparam('line_product_id'))
+                .values(quantity=bindparam('line_quantity')),
+                [{'line_product_id': i, 'line_quantity': quantities[i]} for i in changed]
+            )
+
+        # Units added to or taken off a kept line are priced at the line's price
+        def line(i, units, unit_price):
+            return (order.id, order.user_id, order.order_date, i, units, units * unit_price)
+
+        record_sales(
+            [line(i, quantities[i], prices[i]) for i in added]
+            + [line(i, -current[i][0], current[i][1]) for i in removed]
+            + [line(i, quantities[i] - current[i][0], current[i][1]) for i in changed]
+        )
+
+    # Moving the order to another user moves its count and its lines' spend
+    # (recorded above against the new user) with it
+    if order.user_id != old_user_id:
+        adjust_user_order_summaries(merge_deltas(
+            (old_user_id, (-1, -old_total)),
+            (order.user_id, (1, old_total))
+        ))
+    db.session.commit()
+    return order_schema.jsonify(order), 200
+
+# Delete an order by ID
+@orders_bp.route('/orders/<int:id>', methods=['DELETE'])
+def delete_order(id):
+    order = db.session.get(Order, id)
+    if not order:
+        return jsonify({'message': 'Order not found'}), 404
+
+    lines = db.session.execute(
+        select(order_product.c.product_id, order_product.c.quantity, order_product.c.unit_price)
+        .where(order_product.c.order_id == id)
+    ).all()
+    record_sales(
+        lines=(
+            (id, order.user_id, order.order_date, product_id, -quantity, -quantity * unit_price)
+            for product_id, quantity, unit_price in lines
+        ),
+        orders=[(order.user_id, order.order_date, -1)]
+    )
+    db.session.delete(order)
+    db.session.commit()
+    return jsonify({'message': 'Order deleted successfully'}), 200
+
+# Calculate total price of an order
+@orders_bp.route('/orders/<int:order_id>/total', methods=['GET'])
+def calculate_order_total(order_id):
+    # Stored on the order and kept current by every order write
+    row = db.session.execute(
+        select(Order.total_price, Order.item_count).where(Order.id == order_id)
+    ).first()
+    if not row:
+        return jsonify({'message': 'Order not found'}), 404
+
+    total, product_count = row
+    return jsonify(order_total_payload(order_id, total, product_count)), 200
+
+# Order count and total spent per user from the running summaries;
+# users without orders have no summary row yet
+def user_order_stats_query(user_ids):
+    return (
+        select(
+            User.id,
+            func.coalesce(UserOrderSummary.order_count, 0),
+            func.coalesce(UserOrderSummary.total_spent, 0)
+        )
+        .outerjoin(UserOrderSummary, UserOrderSummary.user_id == User.id)
+        .where(User.id.in_(user_ids))
+    )
+
+def serialize_user_order_stats(row):
+    user_id, total_orders, total_spent = row
+    return {
+        'user_id': user_id,
+        'total_orders': total_orders,
+        'total_spent': round(float(total_spent), 2)
+    }
+
+# Get order statistics for a user
+@orders_bp.route('/users/<int:user_id>/order_stats', methods=['GET'])
+def get_user_order_stats(user_id):
+    row = db.session.execute(user_order_stats_query([user_id])).first()
+    if not row:
+        return jsonify({'message': 'User not found'}), 404
+
+    return jsonify(serialize_user_order_stats(row)), 200
+
+# Get order statistics for many users at once (admin dashboard)
+@orders_bp.route('/users/order_stats', methods=['GET'])
+def get_bulk_user_order_stats():
+    raw_ids = request.args.get('ids', '')
+    try:
+        user_ids = sorted({int(i) for i in raw_ids.split(',') if i.strip()})
+    except ValueError:
+        return jsonify({'message': 'ids must be a comma-separated list of integers'}), 400
+
+    if not user_ids:
+        return jsonify({'message': 'No user IDs provided'}), 400
+
+    if len(user_ids) > 100:
+        return jsonify({'message': 'Cannot request stats for more than 100 users at once'}), 400
+
+    rows = db.session.execute(user_order_stats_query(user_ids)).all()
+    stats = [serialize_user_order_stats(row) for row in rows]
+    found_ids = {s['user_id'] for s in stats}
+
+    return jsonify({
+        'stats': sorted(stats, key=lambda s: s['user_id']),
+        'not_found': [i for i in user_ids if i not in found_ids]
+    }), 200
+
+# Get all orders containing a specific product
+@orders_bp.route('/products/<int:product_id>/orders', methods=['GET'])
+def get_orders_by_product(product_id):
+    expand, error = parse_order_expand()
+    if error:
+        return error
+
+    product = db.session.get(Product, product_id)
+    if not product:
+        return jsonify({'message': 'Product not found'}), 404
+
+    query = (
+        select(*order_rows.columns)
+        .join(order_product, order_product.c.order_id == Order.id)
+        .where(order_product.c.product_id == product_id)
+    )
+    orders = db.session.execute(query).all()
+    if not orders:
+        return jsonify({'message': 'No orders found for this product'}), 404
+
+    return jsonify(dump_orders(query, orders, expand)), 200
+
+# Get all users who ordered a specific product
+@orders_bp.route('/products/<int:product_id>/users', methods=['GET'])
+def get_users_by_product(product_id):
+    product = db.session.get(Product, product_id)
+    if not product:
+        return jsonify({'message': 'Product not found'}), 404
+
+    # Each buyer once, however many of their orders contain the product
+    query = (
+        select(*user_rows.columns)
+        .join(Order, Order.user_id == User.id)
+        .join(order_product, order_product.c.order_id == Order.id)
+        .where(order_product.c.product_id == product_id)
+        .distinct()
+        .order_by(User.id)
+    )
+    users = db.session.execute(query).all()
+    if not users:
+        return jsonify({'message': 'No users found for this product'}), 404
+
+    return jsonify(user_rows.dump(users)), 200
+
+# Filter orders by date range
+@orders_bp.route('/orders/filter', methods=['GET'])
+def filter_orders_by_date():
+    expand, error = parse_order_expand()
+    if error:
+        return error
+
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    if not start_date or not end_date:
+        return jsonify({'message': 'Please provide both start_date and end_date in YYYY-MM-DD format'}), 400
+
+    try:
+        start = datetime.fromisoformat(start_date)
+        end = datetime.fromisoformat(end_date)
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    query = select(*order_rows.columns).where(Order.order_date.between(start, end))
+    orders = db.session.execute(query).all()
+
+    if not orders:
+        return jsonify({'message': 'No orders found in the given date range'}), 404
+
+    return jsonify(dump_orders(query, orders, expand)), 200
+
+
+# ----- Analytics Endpoints -----
+# Both read the rollup tables (see Order Totals), so their cost depends on
+# the number of days / products reported, not on the number of orders
+
+SALES_GRANULARITIES = ('day', 'week', 'month')
+
+# First day of the week (Monday) or month containing day
+def sales_period(granularity, day):
+    if granularity == 'day':
+        return day
+    mysql = db.engine.dialect.name in ('mysql', 'mariadb')
+    if granularity == 'week':
+        return func.subdate(day, func.weekday(day)) if mysql else func.date(day, 'weekday 0', '-6 days')
+    return func.date_format(day, '%Y-%m-01') if mysql else func.strftime('%Y-%m-01', day)
+
+def sales_query(granularity, start=None, end=None):
+    period = sales_period(granularity, DailySales.day).label('period')
+    query = select(
+        period,
+        func.sum(DailySales.order_count),
+        func.sum(DailySales.units),
+        func.round(func.sum(DailySales.revenue), 2)
+    )
+    if start:
+        query = query.where(DailySales.day >= start)
+    if end:
+        query = query.where(DailySales.day <= end)
+    return query.group_by(period).order_by(period)
+
+def top_products_query(limit):
+    return (
+        select(Product.id, Product.product_name, ProductSales.units, ProductSales.revenue)
+        .join(Product, Product.id == ProductSales.product_id)
+        .where(ProductSales.units > 0)
+        .order_by(ProductSales.revenue.desc(), ProductSales.product_id.desc())
+        .limit(limit)
+    )
+
+# Orders, units and revenue per day / week / month:
+# ?granularity=day|week|month&start=YYYY-MM-DD&end=YYYY-MM-DD (both inclusive)
+# Weeks start on Monday; the first and last period only count days in range
+@orders_bp.route('/analytics/sales', methods=['GET'])
+def get_sales_analytics():
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in SALES_GRANULARITIES:
+        return jsonify({'message': f'granularity must be one of: {", ".join(SALES_GRANULARITIES)}'}), 400
+
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    if start and end and start > end:
+        return jsonify({'message': 'start must not be after end'}), 400
+
+    periods = [
+        {
+            # date on MySQL, ISO string on SQLite
+            'period': str(period)[:10],
+            'orders': int(orders),
+            'units': int(units),
+            'revenue': round(float(revenue), 2)
+        }
+        for period, orders, units, revenue in db.session.execute(sales_query(granularity, start, end))
+    ]
+    return jsonify({
+        'granularity': granularity,
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+        'periods': periods,
+        'totals': {
+            'orders': sum(p['orders'] for p in periods),
+            'units': sum(p['units'] for p in periods),
+            'revenue': round(sum(p['revenue'] for p in periods), 2)
+        }
+    }), 200
+
+# Best-selling products by revenue: ?limit= (default 10, max 100)
+@orders_bp.route('/analytics/top_products', methods=['GET'])
+def get_top_products():
+    limit = request.args.get('limit', 10, type=int)
+    if limit < 1:
+        return jsonify({'message': 'limit must be a positive integer'}), 400
+
+    if limit > 100:
+        return jsonify({'message': 'limit cannot exceed 100'}), 400
+
+    rows = db.session.execute(top_products_query(limit)).all()
+    return jsonify({
+        'products': [
+            {'id': id, 'product_name': product_name, 'units': units, 'revenue': round(revenue, 2)}
+            for id, product_name, units, revenue in rows
+        ]
+    }), 200
+
+# Stream all orders, optionally within a date range
+@orders_bp.route('/orders/export', methods=['GET'])
+def export_orders():
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    query = select(*order_rows.columns)
+    try:
+        if start_date:
+            query = query.where(Order.order_date >= datetime.fromisoformat(start_date))
+        if end_date:
+            query = query.where(Order.order_date <= datetime.fromisoformat(end_date))
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    return stream_export('orders', query, Order.id, order_rows)
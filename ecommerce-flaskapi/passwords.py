@@ -0,0 +1,149 @@
+# Password hashing off the request workers
+#
+# Hashing and checking passwords is deliberately CPU-heavy. PasswordHasher
+# keeps that cost from taking the rest of the API down:
+#   - hashes run in a small process pool at a lower CPU priority, so request
+#     workers serving catalog reads win the CPU when both are busy
+#   - a host-wide cap on concurrent hashes (flock'd slot files shared by all
+#     gunicorn workers) means a login burst can only ever tie up a few
+#     workers; the rest keep serving, and extra logins get 503 + Retry-After
+#   - the hash method and cost are configurable, and verify_and_update
+#     returns a fresh hash whenever a stored one uses older parameters
+import fcntl
+import functools
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _lower_priority(niceness):
+    os.nice(niceness)
+
+
+# 'scrypt' and 'scrypt:32768:8:1' are the same method; compare what the
+# hashes actually start with. Worked out once per hashing process.
+@functools.lru_cache(maxsize=None)
+def _method_prefix(method):
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def _verify_and_update(stored_hash, password, method):
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    if stored_hash.split('$', 1)[0] != _method_prefix(method):
+        return True, generate_password_hash(password, method)
+    return True, None
+
+
+class HashingSlots:
+    # Non-blocking flock on one of `count` files; the kernel drops the lock if
+    # the holding worker dies, so slots never leak
+    def __init__(self, directory, count, wait=0.5, poll=0.01):
+        self.directory = directory
+        self.count = count
+        self.wait = wait
+        self.poll = poll
+        os.makedirs(directory, exist_ok=True)
+
+    def _try_acquire(self):
+        for slot in range(self.count):
+            fd = os.open(os.path.join(self.directory, f'slot-{slot}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def acquire(self):
+        deadline = time.monotonic() + self.wait
+        while True:
+            fd = self._try_acquire()
+            if fd is not None:
+                return fd
+            if time.monotonic() >= deadline:
+                raise PasswordHasherBusy()
+            time.sleep(self.poll)
+
+    @staticmethod
+    def release(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt:32768:8:1', processes=1, max_concurrent=2, wait=0.5,
+                 niceness=10, lock_dir=None):
+        self.method = method
+        self.processes = processes
+        self.niceness = niceness
+        self.slots = HashingSlots(
+            lock_dir or os.path.join(tempfile.gettempdir(), 'ecommerce-hash-slots'),
+            max_concurrent, wait=wait
+        )
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            method=config['PASSWORD_HASH_METHOD'],
+            processes=config['PASSWORD_HASH_PROCESSES'],
+            max_concurrent=config['PASSWORD_HASH_MAX_CONCURRENT'],
+            wait=config['PASSWORD_HASH_WAIT'],
+            lock_dir=config['PASSWORD_HASH_LOCK_DIR']
+        )
+
+    # Created on first use, so each gunicorn worker gets its own pool after the fork
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    # spawn: never fork a worker that may hold locks or sockets
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_lower_priority,
+                    initargs=(self.niceness,)
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        fd = self.slots.acquire()
+        try:
+            if not self.processes:
+                return fn(*args)
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # A hashing process died (e.g. OOM killed); start a new pool next time
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                raise PasswordHasherBusy()
+        finally:
+            self.slots.release(fd)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    # Returns (matches, new_hash); new_hash is set when the stored hash used
+    # different parameters and should replace it
+    def verify_and_update(self, stored_hash, password):
+        return self._run(_verify_and_update, stored_hash, password, self.method)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,195 @@
+# Sync (gunicorn) vs async (uvicorn + asgi.py) serving-mode benchmark
+#
+# Seeds a SQLite file, starts each server in turn against the MySQL stand-in
+# in standin.py (every statement delayed by --latency-ms), and drives a mix
+# of catalog reads at a fixed concurrency:
+#   GET /products/<id>, GET /products?page=&per_page=20, GET /products?limit=20
+# The product cache is disabled so every request reaches the database.
+#
+# Each request opens its own connection, as nginx does without upstream
+# keepalive. Reports throughput, p50/p95/p99 latency and errors per mode.
+#
+# Usage:
+#   python perf/async_benchmark.py
+#   python perf/async_benchmark.py --concurrency 200 --latency-ms 10 --workers 2 --output results.json
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERF_DIR = os.path.join(BACKEND_DIR, 'perf')
+
+SERVERS = {
+    # Plain sync workers (gunicorn.conf.py defaults to gthread), one request at a time each
+    'wsgi': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '--pythonpath', PERF_DIR, '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers), '--worker-class', 'sync', '--log-level', 'warning', 'standin:wsgi_app'
+    ],
+    'asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', '--app-dir', PERF_DIR, '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(workers), '--log-level', 'warning', 'standin:asgi_app'
+    ],
+}
+
+
+def seed(database_uri, products):
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=database_uri)
+    script = (
+        'from flask_migrate import upgrade\n'
+        'from sqlalchemy import insert\n'
+        'from app import create_app\n'
+        'from extensions import db\n'
+        'from models import Product\n'
+        'with create_app().app_context():\n'
+        '    upgrade(directory="migrations")\n'
+        f'    db.session.execute(insert(Product), [{{"product_name": f"Product {{i}}", "price": i + 0.99}} for i in range({products})])\n'
+        '    db.session.commit()\n'
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env, check=True)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def request_paths(products, count, rng):
+    paths = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.5:
+            paths.append(f'/products/{rng.randint(1, products)}')
+        elif kind < 0.75:
+            paths.append(f'/products?page={rng.randint(1, max(products // 20, 1))}&per_page=20')
+        else:
+            paths.append('/products?limit=20')
+    return paths
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        status = int(head.split(b' ', 2)[1])
+        await reader.read()
+        return status
+    finally:
+        writer.close()
+
+
+async def drive(port, paths, concurrency, duration):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    next_path = itertools.cycle(paths)
+
+    async def user():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, next(next_path))
+            except (OSError, asyncio.IncompleteReadError):
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return round(sorted_values[index] * 1000, 2)
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(fetch(port, '/products/1')) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def run_mode(mode, args, database_uri):
+    port = free_port()
+    env = dict(
+        os.environ,
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        PRODUCT_CACHE_BACKEND='none',
+        STANDIN_LATENCY_MS=str(args.latency_ms),
+    )
+    server = subprocess.Popen(SERVERS[mode](port, args.workers), cwd=BACKEND_DIR, env=env)
+    try:
+        wait_until_ready(port)
+        paths = request_paths(args.products, 10000, random.Random(42))
+        asyncio.run(drive(port, paths, args.concurrency, args.warmup))
+        latencies, errors, elapsed = asyncio.run(drive(port, paths, args.concurrency, args.duration))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the WSGI and ASGI serving modes on catalog reads')
+    parser.add_argument('--modes', default='wsgi,asgi', help='comma separated: wsgi, asgi')
+    parser.add_argument('--workers', type=int, default=1, help='server processes per mode')
+    parser.add_argument('--concurrency', type=int, default=100, help='simultaneous clients')
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds per mode')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds per mode')
+    parser.add_argument('--latency-ms', type=float, default=5, help='stand-in delay per SQL statement')
+    parser.add_argument('--products', type=int, default=2000, help='products to seed')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database_uri = f'sqlite:///{os.path.join(tmpdir, "bench.db")}?check_same_thread=false'
+        seed(database_uri, args.products)
+
+        results = {
+            'settings': {key: getattr(args, key) for key in
+                         ('workers', 'concurrency', 'duration', 'latency_ms', 'products')},
+        }
+        for mode in args.modes.split(','):
+            results[mode] = run_mode(mode, args, database_uri)
+            stats = results[mode]
+            print(f"{mode:<5} {stats['requests_per_second']:>8} req/s  p50 {stats['p50_ms']} ms  "
+                  f"p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms  errors {stats['errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,612 @@
+# Load test for every API endpoint, with JSON results to compare runs
+#
+# Seeds a database with --users / --products / --orders, then sends each
+# endpoint a fixed list of requests from --concurrency client threads
+# through two drivers:
+#   - client: the Flask test client, in this process (app and serializer
+#     cost without any network or server in the way)
+#   - server: gunicorn started the way the Dockerfile starts it (same
+#     gunicorn.conf.py, --workers), over real HTTP connections
+# Every endpoint reports throughput, p50/p95/p99 latency, errors and SQL
+# statements per request (read from the http_request_sql_queries histogram
+# at /metrics, so the gunicorn numbers cover all workers).
+#
+# The database is seeded again before each driver, and requests are built
+# from a fixed random seed, so two runs on the same machine send the same
+# requests against the same data. Writes and deletes work on rows set aside
+# for them, so every request hits an existing row.
+#
+# Usage:
+#   python perf/benchmark.py                                   # SQLite file, both drivers
+#   python perf/benchmark.py --users 1000 --products 20000 --orders 50000
+#   python perf/benchmark.py --drivers server --workers 4 --concurrency 32
+#   python perf/benchmark.py --only get_products,get_product   # a few endpoints
+#   python perf/benchmark.py --output perf/baseline.json       # save a baseline
+#   python perf/benchmark.py --baseline perf/baseline.json     # fail on regressions
+#   python perf/benchmark.py --database-url mysql+mysqlconnector://...  # scratch MySQL
+#
+# The target database is dropped and re-created, so never point it at a
+# database you care about. Login/register rate limits are switched off;
+# password hashing keeps its production cost and concurrency cap, so
+# /login and /register queue for a hashing slot, and a concurrency far above
+# the CPU count can still answer 503 and show up as errors.
+# Bulk order imports, multi-product deletes and user deletes only queue a
+# background job (202), so their numbers are the request; no job worker runs.
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import cache
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# /metrics is what this script reads; the Flask static route has no API behind it
+NOT_BENCHMARKED = {'get_metrics', 'static'}
+
+PASSWORD = 'benchmark-password'
+# Finished jobs seeded for GET /jobs/<id>
+JOBS = 100
+ADJECTIVES = ['red', 'blue', 'small', 'large', 'classic', 'modern', 'wooden', 'steel', 'smart', 'portable']
+NOUNS = ['chair', 'table', 'lamp', 'phone', 'speaker', 'kettle', 'backpack', 'watch', 'camera', 'monitor']
+
+
+# The in-process app, created once main() has set up the environment
+@cache
+def benchmark_app():
+    from app import create_app
+    return create_app()
+
+
+class Dataset:
+    # Row ids laid out by seed(); every table starts empty, so ids count up from 1
+    def __init__(self, users, products, orders, spare):
+        self.users = users
+        self.products = products
+        self.orders = orders
+        self.spare = spare
+        # Rows only ever touched by the destructive scenarios, `spare` of each
+        self.spare_user_ids = iter(range(users + 1, users + spare + 1))
+        self.spare_product_ids = iter(range(products + 1, products + spare * 11 + 1))
+        self.spare_order_ids = iter(range(orders + 1, orders + spare + 1))
+        self.order_ids_to_add_to = iter(range(orders + spare + 1, orders + spare * 2 + 1))
+        self.order_ids_to_remove_from = iter(range(orders + spare + 1, orders + spare * 2 + 1))
+        self.new_emails = (f'new-user-{n}@example.com' for n in itertools.count(1))
+        self.tokens = {}
+        self.refresh_tokens = {}
+        self.ordered_product_ids = []
+
+    # Tokens that don't expire mid-run; each user's is reused across requests
+    def token(self, user_id):
+        if user_id not in self.tokens:
+            self.tokens[user_id] = self.new_token(user_id)
+        return {'Authorization': f'Bearer {self.tokens[user_id]}'}
+
+    def refresh_token(self, user_id):
+        if user_id not in self.refresh_tokens:
+            self.refresh_tokens[user_id] = self.new_token(user_id, refresh=True)
+        return {'Authorization': f'Bearer {self.refresh_tokens[user_id]}'}
+
+    # A token used once, for requests that revoke it
+    def new_token(self, user_id, refresh=False):
+        from flask_jwt_extended import create_access_token, create_refresh_token
+        create_token = create_refresh_token if refresh else create_access_token
+        with benchmark_app().app_context():
+            return create_token(identity=str(user_id), expires_delta=False)
+
+
+def seed(args, spare, rng):
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from extensions import db, product_cache, search_index, token_denylist, user_cache
+    from models import User, Product, Order, Job, order_product
+    from order_totals import rebuild_order_totals
+
+    app = benchmark_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        # One real hash shared by every user: logins pay the production cost
+        password = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+        db.session.execute(insert(User), [
+            {'name': f'User {i}', 'address': f'{i} Main Street', 'email': f'user{i}@example.com', 'password': password}
+            for i in range(1, args.users + spare + 1)
+        ])
+        prices = [round(rng.uniform(1, 500), 2) for _ in range(args.products + spare * 11)]
+        db.session.execute(insert(Product), [
+            {'product_name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}', 'price': price}
+            for i, price in enumerate(prices, 1)
+        ])
+
+        now = datetime.now()
+        db.session.execute(insert(Order), [
+            {'user_id': rng.randint(1, args.users), 'order_date': now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))}
+            for _ in range(args.orders + spare * 2)
+        ])
+        rows, ordered = [], set()
+        for order_id in range(1, args.orders + 1):
+            picked = rng.sample(range(1, args.products + 1), min(args.products_per_order, args.products))
+            rows.extend({'order_id': order_id, 'product_id': p, 'unit_price': prices[p - 1]} for p in picked)
+            ordered.update(picked)
+        # Spare orders only hold product 1: deletes drop it, add_product adds product 2
+        rows.extend({'order_id': order_id, 'product_id': 1, 'unit_price': prices[0]}
+                    for order_id in range(args.orders + 1, args.orders + spare * 2 + 1))
+        db.session.execute(insert(order_product), rows)
+        db.session.execute(insert(Job), [
+            {'kind': 'delete_products', 'payload': {'product_ids': [n]}, 'status': 'succeeded', 'progress': 1,
+             'total': 1, 'result': {'deleted': 1}, 'attempts': 1, 'started_at': now, 'finished_at': now}
+            for n in range(1, JOBS + 1)
+        ])
+        db.session.commit()
+        rebuild_order_totals()
+        db.engine.dispose()
+
+        product_cache.backend.clear()
+        user_cache.backend.clear()
+        token_denylist.backend.clear()
+        search_index.invalidate()
+    data = Dataset(args.users, args.products, args.orders, spare)
+    data.ordered_product_ids = sorted(ordered)
+    return data
+
+
+def some_user(data, rng):
+    return rng.randint(1, data.users)
+
+
+def some_product(data, rng):
+    return rng.randint(1, data.products)
+
+
+# A product that is in at least one order (the per-product endpoints 404 otherwise)
+def some_ordered_product(data, rng):
+    return rng.choice(data.ordered_product_ids)
+
+
+def some_order(data, rng):
+    return rng.randint(1, data.orders)
+
+
+def some_job(data, rng):
+    return rng.randint(1, JOBS)
+
+
+def date_window(rng, days):
+    end = datetime.now().date() - timedelta(days=rng.randint(0, 365 - days))
+    return f'start_date={end - timedelta(days=days)}&end_date={end}'
+
+
+def update_user(data, rng):
+    user_id = some_user(data, rng)
+    return 'PUT', f'/users/{user_id}', {'address': f'{rng.randint(1, 999)} Benchmark Road'}, data.token(user_id)
+
+
+def delete_user(data, rng):
+    user_id = next(data.spare_user_ids)
+    return 'DELETE', f'/users/{user_id}', None, data.token(user_id)
+
+
+# (name, Flask endpoint, request builder) - builders return (method, path,
+# json body, headers). Reads first, then writes, then deletes, so the reads
+# see the seeded data.
+SCENARIOS = [
+    ('get_users', 'users.get_users', lambda data, rng: ('GET', '/users', None, None)),
+    ('get_user', 'users.get_user', lambda data, rng: ('GET', f'/users/{some_user(data, rng)}', None, None)),
+    ('get_current_user', 'users.get_current_user',
+     lambda data, rng: ('GET', '/users/me', None, data.token(some_user(data, rng)))),
+    ('get_products', 'products.get_products',
+     lambda data, rng: ('GET', f'/products?page={rng.randint(1, max(data.products // 20, 1))}&per_page=20', None, None)),
+    ('get_products_cursor', 'products.get_products', lambda data, rng: ('GET', '/products?limit=20', None, None)),
+    ('get_product', 'products.get_product', lambda data, rng: ('GET', f'/products/{some_product(data, rng)}', None, None)),
+    ('get_job', 'jobs.get_job', lambda data, rng: ('GET', f'/jobs/{some_job(data, rng)}', None, None)),
+    ('get_product_cache_stats', 'products.get_product_cache_stats', lambda data, rng: ('GET', '/products/cache_stats', None, None)),
+    ('search_products', 'products.search_products',
+     lambda data, rng: ('GET', f'/products/search?q={rng.choice(ADJECTIVES)}+{rng.choice(NOUNS)[:3]}&limit=20', None, None)),
+    ('get_orders', 'orders.get_orders', lambda data, rng: ('GET', '/orders', None, None)),
+    ('get_order', 'orders.get_order', lambda data, rng: ('GET', f'/orders/{some_order(data, rng)}', None, None)),
+    ('get_order_expanded', 'orders.get_order',
+     lambda data, rng: ('GET', f'/orders/{some_order(data, rng)}?expand=products,total', None, None)),
+    ('get_orders_by_user', 'orders.get_orders_by_user',
+     lambda data, rng: ('GET', f'/orders/user/{some_user(data, rng)}', None, None)),
+    ('get_orders_by_user_expanded', 'orders.get_orders_by_user',
+     lambda data, rng: ('GET', f'/orders/user/{some_user(data, rng)}?expand=products,total', None, None)),
+    ('get_products_in_order', 'orders.get_products_in_order',
+     lambda data, rng: ('GET', f'/orders/{some_order(data, rng)}/products', None, None)),
+    ('calculate_order_total', 'orders.calculate_order_total',
+     lambda data, rng: ('GET', f'/orders/{some_order(data, rng)}/total', None, None)),
+    ('get_user_order_stats', 'orders.get_user_order_stats',
+     lambda data, rng: ('GET', f'/users/{some_user(data, rng)}/order_stats', None, None)),
+    ('get_bulk_user_order_stats', 'orders.get_bulk_user_order_stats',
+     lambda data, rng: ('GET', '/users/order_stats?ids=' + ','.join(str(some_user(data, rng)) for _ in range(10)), None, None)),
+    ('get_orders_by_product', 'orders.get_orders_by_product',
+     lambda data, rng: ('GET', f'/products/{some_ordered_product(data, rng)}/orders', None, None)),
+    ('get_users_by_product', 'orders.get_users_by_product',
+     lambda data, rng: ('GET', f'/products/{some_ordered_product(data, rng)}/users', None, None)),
+    ('filter_orders_by_date', 'orders.filter_orders_by_date',
+     lambda data, rng: ('GET', f'/orders/filter?{date_window(rng, 30)}', None, None)),
+    ('get_sales_analytics', 'orders.get_sales_analytics',
+     lambda data, rng: ('GET', f'/analytics/sales?granularity={rng.choice(("day", "week", "month"))}', None, None)),
+    ('get_top_products', 'orders.get_top_products', lambda data, rng: ('GET', '/analytics/top_products?limit=20', None, None)),
+    ('export_orders', 'orders.export_orders', lambda data, rng: ('GET', f'/orders/export?{date_window(rng, 30)}', None, None)),
+    ('export_users', 'users.export_users', lambda data, rng: ('GET', '/users/export?format=csv', None, None)),
+    ('get_pool_metrics', 'get_pool_metrics', lambda data, rng: ('GET', '/metrics/pool', None, None)),
+    ('login', 'users.login',
+     lambda data, rng: ('POST', '/login', {'email': f'user{some_user(data, rng)}@example.com', 'password': PASSWORD}, None)),
+    ('refresh_access_token', 'users.refresh_access_token',
+     lambda data, rng: ('POST', '/token/refresh', None, data.refresh_token(some_user(data, rng)))),
+    ('logout', 'users.logout',
+     lambda data, rng: ('POST', '/logout', None, {'Authorization': f'Bearer {data.new_token(some_user(data, rng))}'})),
+    ('register', 'users.register',
+     lambda data, rng: ('POST', '/register', {'name': 'New User', 'email': next(data.new_emails), 'password': PASSWORD}, None)),
+    ('update_user', 'users.update_user', update_user),
+    ('create_product', 'products.create_product',
+     lambda data, rng: ('POST', '/products', {'product_name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}',
+                                               'price': round(rng.uniform(1, 500), 2)}, None)),
+    ('update_product', 'products.update_product',
+     lambda data, rng: ('PUT', f'/products/{some_product(data, rng)}', {'price': round(rng.uniform(1, 500), 2)}, None)),
+    ('create_products_bulk', 'products.create_products_bulk',
+     lambda data, rng: ('POST', '/products/bulk', [{'product_name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}',
+                                                    'price': round(rng.uniform(1, 500), 2)} for _ in range(100)], None)),
+    ('update_products_bulk', 'products.update_products_bulk',
+     lambda data, rng: ('PATCH', '/products/bulk', [{'id': some_product(data, rng), 'price': round(rng.uniform(1, 500), 2)}
+                                                     for _ in range(100)], None)),
+    ('create_order', 'orders.create_order',
+     lambda data, rng: ('POST', '/orders', {'user_id': some_user(data, rng),
+                                             'product_ids': [some_product(data, rng) for _ in range(3)]}, None)),
+    ('create_order_with_quantities', 'orders.create_order',
+     lambda data, rng: ('POST', '/orders', {'user_id': some_user(data, rng),
+                                             'items': [{'product_id': some_product(data, rng), 'quantity': rng.randint(1, 5)}
+                                                       for _ in range(3)]}, None)),
+    ('create_orders_bulk', 'orders.create_orders_bulk',
+     lambda data, rng: ('POST', '/orders/bulk', [{'user_id': some_user(data, rng),
+                                                   'product_ids': [some_product(data, rng) for _ in range(3)]}
+                                                  for _ in range(20)], None)),
+    ('update_order', 'orders.update_order',
+     lambda data, rng: ('PUT', f'/orders/{some_order(data, rng)}',
+                        {'product_ids': [some_product(data, rng) for _ in range(3)]}, None)),
+    ('add_product_to_order', 'orders.add_product_to_order',
+     lambda data, rng: ('PUT', f'/orders/{next(data.order_ids_to_add_to)}/add_product/2', None, None)),
+    # A few hot lines, so concurrent requests hit the quantity = quantity + n path
+    ('add_units_to_order', 'orders.add_product_to_order',
+     lambda data, rng: ('PUT', f'/orders/{rng.randint(1, 10)}/add_product/{rng.randint(1, 5)}?quantity={rng.randint(1, 3)}',
+                        None, None)),
+    ('remove_product_from_order', 'orders.remove_product_from_order',
+     lambda data, rng: ('DELETE', f'/orders/{next(data.order_ids_to_remove_from)}/remove_product/1', None, None)),
+    ('delete_order', 'orders.delete_order', lambda data, rng: ('DELETE', f'/orders/{next(data.spare_order_ids)}', None, None)),
+    ('delete_product', 'products.delete_product',
+     lambda data, rng: ('DELETE', f'/products/{next(data.spare_product_ids)}', None, None)),
+    ('delete_multiple_products', 'products.delete_multiple_products',
+     lambda data, rng: ('DELETE', '/products/delete_multiple',
+                        {'product_ids': [next(data.spare_product_ids) for _ in range(10)]}, None)),
+    ('delete_user', 'users.delete_user', delete_user),
+]
+
+
+# ----- Drivers -----
+
+class TestClientDriver:
+    name = 'client'
+
+    def __init__(self, args, env):
+        self.app = benchmark_app()
+
+    def connect(self):
+        client = self.app.test_client()
+
+        def send(method, path, body, headers):
+            response = client.open(path, method=method, json=body, headers=headers)
+            response.get_data()  # drain streamed exports
+            status = response.status_code
+            response.close()
+            return status
+
+        return send
+
+    def get_text(self, path):
+        return self.app.test_client().get(path).get_data(as_text=True)
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    name = 'server'
+
+    def __init__(self, args, env):
+        self.port = free_port()
+        self.metrics_dir = tempfile.mkdtemp(prefix='benchmark-metrics-')
+        # Same command line as the Dockerfile, so gunicorn.conf.py is loaded too
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{self.port}', '--workers', str(args.workers),
+             '--timeout', '120', '--log-level', 'warning', 'app:create_app()'],
+            cwd=BACKEND_DIR, env=dict(env, PROMETHEUS_MULTIPROC_DIR=self.metrics_dir)
+        )
+        self.wait_until_ready()
+
+    def wait_until_ready(self, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            try:
+                self.get_text('/metrics/pool')
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f'gunicorn on port {self.port} did not start')
+
+    def connect(self):
+        # gunicorn's sync workers close every connection; http.client reopens as needed
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+
+        def send(method, path, body, headers):
+            headers = dict(headers or {})
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                return None
+
+        return send
+
+    def get_text(self, path):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        try:
+            conn.request('GET', path)
+            return conn.getresponse().read().decode()
+        finally:
+            conn.close()
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+
+DRIVERS = {'client': TestClientDriver, 'server': ServerDriver}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# ----- Measuring -----
+
+# {endpoint: (requests observed, SQL statements)} from the /metrics histogram
+def sql_counts(driver):
+    from prometheus_client.parser import text_string_to_metric_families
+
+    counts = {}
+    for family in text_string_to_metric_families(driver.get_text('/metrics')):
+        if family.name != 'http_request_sql_queries':
+            continue
+        for sample in family.samples:
+            endpoint = sample.labels['endpoint']
+            seen, total = counts.get(endpoint, (0, 0))
+            if sample.name.endswith('_count'):
+                counts[endpoint] = (seen + sample.value, total)
+            elif sample.name.endswith('_sum'):
+                counts[endpoint] = (seen, total + sample.value)
+    return counts
+
+
+def run_requests(driver, requests, concurrency):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    pending = iter(requests)
+
+    def worker():
+        send = driver.connect()
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                return
+            start = time.perf_counter()
+            status = send(*request)
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status is not None and status < 400:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(min(concurrency, len(requests)))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return round(sorted_values[index] * 1000, 2)
+
+
+def measure(driver, scenarios, data, args):
+    results = {}
+    for name, endpoint, build in scenarios:
+        rng = random.Random(f'{args.seed}:{name}')
+        warmup = [build(data, rng) for _ in range(args.warmup)]
+        requests = [build(data, rng) for _ in range(args.requests)]
+        run_requests(driver, warmup, args.concurrency)
+
+        before = sql_counts(driver)
+        latencies, statuses, elapsed = run_requests(driver, requests, args.concurrency)
+        after = sql_counts(driver)
+
+        seen = after.get(endpoint, (0, 0))[0] - before.get(endpoint, (0, 0))[0]
+        statements = after.get(endpoint, (0, 0))[1] - before.get(endpoint, (0, 0))[1]
+        latencies.sort()
+        results[name] = {
+            'requests': len(requests),
+            'errors': len(requests) - len(latencies),
+            'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+            'requests_per_second': round(len(requests) / elapsed, 1),
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'queries_per_request': round(statements / seen, 2) if seen else None,
+        }
+        stats = results[name]
+        print(f"  {name:<28} {stats['requests_per_second']:>8} req/s  p50 {stats['p50_ms']!s:>8}  "
+              f"p95 {stats['p95_ms']!s:>8}  p99 {stats['p99_ms']!s:>8}  "
+              f"sql {stats['queries_per_request']!s:>5}  errors {stats['errors']}")
+    return results
+
+
+# ----- Baseline comparison -----
+
+# A run regresses when p95 latency or throughput moves by more than
+# tolerance, when an endpoint needs more SQL per request, or when an
+# endpoint that had no errors starts failing
+def compare(results, baseline, tolerance):
+    regressions = []
+    for driver, endpoints in results['drivers'].items():
+        for name, stats in endpoints.items():
+            base = baseline.get('drivers', {}).get(driver, {}).get(name)
+            if base is None:
+                continue
+            label = f'{driver}/{name}'
+            if base['p95_ms'] and stats['p95_ms'] and stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{label}: p95 {stats['p95_ms']} ms, baseline {base['p95_ms']} ms")
+            if stats['requests_per_second'] < base['requests_per_second'] * (1 - tolerance):
+                regressions.append(f"{label}: {stats['requests_per_second']} req/s, "
+                                   f"baseline {base['requests_per_second']} req/s")
+            if (base['queries_per_request'] is not None and stats['queries_per_request'] is not None
+                    and stats['queries_per_request'] > base['queries_per_request']):
+                regressions.append(f"{label}: {stats['queries_per_request']} queries per request, "
+                                   f"baseline {base['queries_per_request']}")
+            if not base['errors'] and stats['errors']:
+                regressions.append(f"{label}: {stats['errors']} errors, baseline had none")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every API endpoint through the test client and gunicorn')
+    parser.add_argument('--database-url', help='scratch database to drop, re-create and seed')
+    parser.add_argument('--users', type=int, default=200, help='users to seed')
+    parser.add_argument('--products', type=int, default=2000, help='products to seed')
+    parser.add_argument('--orders', type=int, default=2000, help='orders to seed')
+    parser.add_argument('--products-per-order', type=int, default=3, help='products in each seeded order')
+    parser.add_argument('--drivers', default='client,server', help='comma separated: client, server')
+    parser.add_argument('--only', help='comma separated scenario names to run')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for the server driver')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for data and requests')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='results JSON from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95/throughput change vs the baseline')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    database_uri = args.database_url or f'sqlite:///{os.path.join(tmpdir.name, "benchmark.db")}'
+    os.environ.update(
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        RATE_LIMIT_BACKEND='none',
+        PASSWORD_HASH_LOCK_DIR=os.path.join(tmpdir.name, 'hash-slots'),
+    )
+    # This process reads its own metrics; gunicorn gets a directory of its own
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+    app = benchmark_app()
+
+    scenarios = SCENARIOS
+    if args.only:
+        wanted = set(args.only.split(','))
+        unknown = wanted - {name for name, _, _ in SCENARIOS}
+        if unknown:
+            parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+        scenarios = [scenario for scenario in SCENARIOS if scenario[0] in wanted]
+    else:
+        uncovered = {rule.endpoint for rule in app.url_map.iter_rules()} - NOT_BENCHMARKED \
+            - {endpoint for _, endpoint, _ in SCENARIOS}
+        if uncovered:
+            print(f'Warning: no scenario for {", ".join(sorted(uncovered))}\n')
+
+    results = {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'database': database_uri.split(':', 1)[0],
+        },
+        'settings': {key: getattr(args, key) for key in (
+            'users', 'products', 'orders', 'products_per_order', 'requests', 'warmup', 'concurrency', 'workers', 'seed'
+        )},
+        'drivers': {},
+    }
+
+    # Each destructive scenario consumes one spare row per request
+    spare = args.requests + args.warmup
+    try:
+        for driver_name in args.drivers.split(','):
+            start = time.perf_counter()
+            data = seed(args, spare, random.Random(args.seed))
+            print(f'{driver_name}: seeded in {time.perf_counter() - start:.1f}s')
+            driver = DRIVERS[driver_name](args, dict(os.environ))
+            try:
+                results['drivers'][driver_name] = measure(driver, scenarios, data, args)
+            finally:
+                driver.close()
+    finally:
+        tmpdir.cleanup()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f'\nWrote {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('settings') != results['settings']:
+            print(f'\nWarning: {args.baseline} was run with different settings: {baseline.get("settings")}')
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'\nRegressions against {args.baseline}:')
+            print('\n'.join(f'  - {r}' for r in regressions))
+            return 1
+        print(f'\nNo regressions against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,329 @@
+# nginx benchmark: catalog reads through the repo's nginx config
+#
+# Starts gunicorn (gunicorn.conf.py, as in the Dockerfile) on a seeded SQLite
+# database and runs nginx in front of it with nginx/nginx.conf, rewritten
+# only to point at local ports and directories. The same anonymous
+# GET /api/products* mix is then sent three ways:
+#
+#   direct  - straight to gunicorn, no nginx
+#   plain   - nginx without upstream keepalive, gzip or the micro-cache
+#             (the config before they were added)
+#   tuned   - nginx/nginx.conf as shipped
+#
+# and for each it reports throughput, latency, bytes on the wire per
+# response and the share of responses nginx served from its cache.
+#
+# It then checks the purge path against a stand-in backend: a refetch sent
+# the way EdgeCachePurger sends it must replace the entry clients read under
+# the public host, and a wrong secret must not get past the cache.
+#
+# Needs an nginx binary (--nginx); nothing is installed or left running.
+#
+# Usage:
+#   python perf/edge_benchmark.py
+#   python perf/edge_benchmark.py --nginx /usr/sbin/nginx --requests 5000 --concurrency 32
+import argparse
+import http.client
+import http.server
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NGINX_CONF = os.path.join(os.path.dirname(BACKEND_DIR), 'nginx', 'nginx.conf')
+sys.path.insert(0, BACKEND_DIR)
+
+# What the nginx image's entrypoint would fill the secret in with
+PURGE_SECRET = 'edge-benchmark-secret'
+CLIENT_HOST = 'shop.example.com'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{process.args[0]} exited with {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'nothing listening on port {port}')
+
+
+def seed(database_uri, products):
+    from sqlalchemy import insert
+    from app import create_app
+    from extensions import db
+    from models import Product
+
+    rng = random.Random(1)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_uri})
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Product), [
+            {'product_name': f'Product {i} {rng.choice("abcdefgh") * 8}', 'price': round(rng.uniform(1, 500), 2)}
+            for i in range(1, products + 1)
+        ])
+        db.session.commit()
+        db.engine.dispose()
+
+
+def replace(text, old, new):
+    if old not in text:
+        raise RuntimeError(f'nginx.conf no longer contains {old!r}; update edge_benchmark.py')
+    return text.replace(old, new)
+
+
+# nginx/nginx.conf with local ports and paths; plain=True takes out
+# keepalive, gzip and the micro-cache
+def render_nginx_conf(directory, listen_port, backend_port, plain):
+    with open(NGINX_CONF) as f:
+        conf = f.read()
+
+    conf = replace(conf, 'include /etc/nginx/mime.types;', '')
+    conf = replace(conf, 'server backend:5000;', f'server 127.0.0.1:{backend_port};')
+    conf = replace(conf, 'listen 80;', f'listen 127.0.0.1:{listen_port};')
+    conf = replace(conf, '/var/cache/nginx/api', os.path.join(directory, 'cache'))
+    conf = replace(conf, '${EDGE_CACHE_PURGE_SECRET}', PURGE_SECRET)
+    # No frontend here
+    conf = re.sub(r'\n    upstream frontend \{.*?\n    \}\n', '\n', conf, flags=re.S)
+    conf = re.sub(r'\n        # Frontend routes.*?\n        \}\n', '\n', conf, flags=re.S)
+    conf = replace(conf, 'http {', '\n'.join([
+        'http {',
+        '    access_log off;',
+        *(f'    {kind}_temp_path {os.path.join(directory, kind)};'
+          for kind in ('client_body', 'proxy', 'fastcgi', 'uwsgi', 'scgi')),
+    ]))
+    conf = f'daemon off;\npid {os.path.join(directory, "nginx.pid")};\nerror_log {os.path.join(directory, "error.log")} warn;\n' + conf
+
+    if plain:
+        conf = replace(conf, '        keepalive 32;\n', '')
+        conf = replace(conf, '        keepalive_timeout 30s;\n', '')
+        conf = replace(conf, 'gzip on;', 'gzip off;')
+        conf = replace(conf, 'proxy_cache api_micro;', 'proxy_cache off;')
+
+    path = os.path.join(directory, 'nginx.conf')
+    with open(path, 'w') as f:
+        f.write(conf)
+    return path
+
+
+# A storefront browsing mix: the first catalog pages and a hot set of products
+def request_paths(args, rng):
+    pages = max(args.products // 20, 1)
+    paths = []
+    for _ in range(args.requests):
+        if rng.random() < 0.4:
+            page = min(int(rng.expovariate(0.3)) + 1, pages)
+            paths.append(f'/products?page={page}&per_page=20')
+        else:
+            paths.append(f'/products/{rng.randint(1, min(args.hot_products, args.products))}')
+    return paths
+
+
+def run_load(port, prefix, paths, concurrency):
+    latencies, sizes, cache_hits, errors = [], [], [0], [0]
+    lock = threading.Lock()
+    chunks = [paths[i::concurrency] for i in range(concurrency)]
+
+    def worker(chunk):
+        # One keep-alive connection per client thread, like a browser
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        for path in chunk:
+            started = time.perf_counter()
+            connection.request('GET', prefix + path, headers={'Accept-Encoding': 'gzip'})
+            response = connection.getresponse()
+            body = response.read()
+            elapsed = time.perf_counter() - started
+            local.append((elapsed, len(body), response.status, response.getheader('X-Cache-Status')))
+        connection.close()
+        with lock:
+            for elapsed, size, status, cache_status in local:
+                latencies.append(elapsed)
+                sizes.append(size)
+                if status != 200:
+                    errors[0] += 1
+                if cache_status in ('HIT', 'STALE', 'UPDATING', 'REVALIDATED'):
+                    cache_hits[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests_per_second': round(len(paths) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        'bytes_per_response': round(statistics.mean(sizes)),
+        'cache_hit_ratio': round(cache_hits[0] / len(paths), 3),
+        'errors': errors[0],
+    }
+
+
+def fetch(port, path, headers):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        return response, response.read()
+    finally:
+        connection.close()
+
+
+# Stand-in API for the purge check: every response is cacheable and carries
+# how many requests reached it, so a read shows which fill nginx served
+class CountingBackend(http.server.BaseHTTPRequestHandler):
+    served = 0
+
+    def do_GET(self):
+        type(self).served += 1
+        body = json.dumps({'served': self.served}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'public, max-age=0, must-revalidate, s-maxage=60')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# Runs nginx/nginx.conf in front of CountingBackend, refetches a product the
+# way EdgeCachePurger does (under nginx's own address, with the secret) and
+# reads it back as a browser would under the public host. Returns a list of
+# problems.
+def check_purge(nginx, directory):
+    from edge_cache import EdgeCachePurger
+
+    backend = http.server.ThreadingHTTPServer(('127.0.0.1', 0), CountingBackend)
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+    listen_port = free_port()
+    conf = render_nginx_conf(directory, listen_port, backend.server_address[1], plain=False)
+    process = subprocess.Popen([nginx, '-p', directory, '-c', conf])
+    try:
+        wait_for_port(listen_port, process)
+        purger = EdgeCachePurger(f'http://127.0.0.1:{listen_port}/api', PURGE_SECRET)
+        client = {'Host': CLIENT_HOST}
+
+        def read(headers=client):
+            response, body = fetch(listen_port, '/api/products/1', headers)
+            return response.getheader('X-Cache-Status'), json.loads(body)['served']
+
+        problems = []
+        purger.refresh('/products/1')
+        if read() != ('HIT', 1):
+            problems.append(f'a refetch did not fill the entry read with Host: {CLIENT_HOST}')
+        if read(dict(client, **{'X-Cache-Refresh': 'not-the-secret'})) != ('HIT', 1):
+            problems.append('a wrong X-Cache-Refresh secret got past the cache')
+        purger.refresh('/products/1')
+        if read() != ('HIT', 2):
+            problems.append(f'a refetch did not replace the entry read with Host: {CLIENT_HOST}')
+        return problems
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        backend.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark catalog reads through nginx/nginx.conf')
+    parser.add_argument('--nginx', default='nginx', help='nginx binary')
+    parser.add_argument('--products', type=int, default=2000, help='products to seed')
+    parser.add_argument('--hot-products', type=int, default=200, help='products the reads pick from')
+    parser.add_argument('--requests', type=int, default=3000, help='requests per variant')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the request mix')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    nginx = shutil.which(args.nginx)
+    if nginx is None:
+        print(f'nginx binary not found ({args.nginx}); pass --nginx /path/to/nginx')
+        return 1
+
+    paths = request_paths(args, random.Random(args.seed))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f'sqlite:///{os.path.join(tmp, "edge.db")}'
+        seed(database_uri, args.products)
+
+        backend_port = free_port()
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URI=database_uri)
+        env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        gunicorn = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{backend_port}', '--workers', str(args.workers),
+             '--log-level', 'warning', 'app:create_app()'],
+            cwd=BACKEND_DIR, env=env
+        )
+        try:
+            wait_for_port(backend_port, gunicorn)
+            # Warm the per-worker product caches so every variant sees the same app state
+            run_load(backend_port, '', paths, args.concurrency)
+            results['direct'] = run_load(backend_port, '', paths, args.concurrency)
+
+            for variant in ('plain', 'tuned'):
+                directory = os.path.join(tmp, variant)
+                os.makedirs(directory)
+                listen_port = free_port()
+                conf = render_nginx_conf(directory, listen_port, backend_port, plain=variant == 'plain')
+                process = subprocess.Popen([nginx, '-p', directory, '-c', conf])
+                try:
+                    wait_for_port(listen_port, process)
+                    results[variant] = run_load(listen_port, '/api', paths, args.concurrency)
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+        finally:
+            gunicorn.terminate()
+            gunicorn.wait(timeout=30)
+
+        directory = os.path.join(tmp, 'purge')
+        os.makedirs(directory)
+        purge_problems = check_purge(nginx, directory)
+
+    print(f'{args.requests} anonymous catalog reads from {args.concurrency} threads, {args.workers} gunicorn workers')
+    for variant, result in results.items():
+        print(f'  {variant:<7} {result["requests_per_second"]:8.1f} req/s  p50 {result["p50_ms"]:7.2f}  '
+              f'p95 {result["p95_ms"]:7.2f}  {result["bytes_per_response"]:6d} B/response  '
+              f'cache hits {result["cache_hit_ratio"]:.1%}  errors {result["errors"]}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if purge_problems:
+        print('Edge cache purge:')
+        for problem in purge_problems:
+            print(f'  {problem}')
+        return 1
+    print('Edge cache purge: refetches replace the entry clients read')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# EXPLAIN-based index check for the hot queries
+#
+# Builds the schema from the migrations (not db.create_all), seeds enough
+# rows for the planner to prefer indexes, then runs EXPLAIN on each hot
+# query and fails if any table is read with a full scan.
+#
+# Usage:
+#   python perf/explain_check.py                                  # throwaway SQLite file
+#   python perf/explain_check.py --database-url mysql+mysqlconnector://...  # scratch MySQL db
+#
+# The target database is upgraded and filled with test rows, so never point
+# it at a database you care about.
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEED_USERS = 200
+SEED_PRODUCTS = 500
+SEED_ORDERS_PER_USER = 10
+SEED_PRODUCTS_PER_ORDER = 3
+
+
+def hot_queries(dialect):
+    from datetime import date, datetime
+    from sqlalchemy import select
+    from models import User, Product, Order, Job, order_product
+    from orders import order_products_query, user_order_stats_query, sales_query, top_products_query
+    from products import fulltext_search_query
+
+    queries = [
+        ('filter_orders_by_date',
+         select(Order).where(Order.order_date.between(datetime(2024, 1, 1), datetime(2024, 1, 31)))),
+        ('get_orders_by_user',
+         select(Order).where(Order.user_id == 1)),
+        ('get_orders_by_product',
+         select(order_product.c.order_id).where(order_product.c.product_id == 1)),
+        ('get_products_in_order',
+         select(order_product.c.product_id).where(order_product.c.order_id == 1)),
+        ('expand_order_products',
+         order_products_query(select(Order.id).where(Order.user_id == 1))),
+        ('get_user_order_stats',
+         user_order_stats_query([1])),
+        ('get_products_cursor',
+         select(Product).where(Product.id > 100).order_by(Product.id).limit(20)),
+        ('get_sales_analytics',
+         sales_query('month', date(2023, 1, 1), date(2023, 12, 31))),
+        ('get_top_products',
+         top_products_query(10)),
+        ('login_by_email',
+         select(User).where(User.email == 'user1@example.com')),
+        ('claim_job',
+         select(Job.id).where(Job.status == 'queued').order_by(Job.id).limit(1)),
+    ]
+    # Search only hits the database through the FULLTEXT index on MySQL
+    if dialect in ('mysql', 'mariadb'):
+        queries.append(('search_products', fulltext_search_query(['product', '1'], 20, min_price=10)))
+    return queries
+
+
+def seed(db):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from models import User, Product, Order, order_product
+    from order_totals import rebuild_order_totals
+
+    start = datetime(2023, 1, 1)
+    db.session.execute(insert(User), [
+        {'name': f'User {i}', 'address': '', 'email': f'user{i}@example.com', 'password': 'x'}
+        for i in range(SEED_USERS)
+    ])
+    db.session.execute(insert(Product), [
+        {'product_name': f'Product {i}', 'price': i + 0.99} for i in range(SEED_PRODUCTS)
+    ])
+    order_count = SEED_USERS * SEED_ORDERS_PER_USER
+    db.session.execute(insert(Order), [
+        {'user_id': i % SEED_USERS + 1, 'order_date': start + timedelta(hours=i)}
+        for i in range(order_count)
+    ])
+    db.session.execute(insert(order_product), [
+        {'order_id': o, 'product_id': (o * 7 + k) % SEED_PRODUCTS + 1}
+        for o in range(1, order_count + 1)
+        for k in range(SEED_PRODUCTS_PER_ORDER)
+    ])
+    db.session.commit()
+    rebuild_order_totals()
+
+
+def compile_sql(db, query):
+    return str(query.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+
+def full_scans_sqlite(db, sql):
+    rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')).all()
+    plan = [row[-1] for row in rows]
+    # "SCAN <table>" without an index is a full table scan; SEARCH and
+    # "SCAN ... USING (COVERING) INDEX" both go through an index
+    scans = [line for line in plan if line.startswith('SCAN') and 'INDEX' not in line]
+    return plan, scans
+
+
+def full_scans_mysql(db, sql):
+    result = db.session.execute(db.text(f'EXPLAIN {sql}'))
+    rows = [dict(zip(result.keys(), row)) for row in result]
+    plan = [f"{row['table']}: type={row['type']} key={row['key']}" for row in rows]
+    scans = [line for line, row in zip(plan, rows) if row['type'] == 'ALL']
+    return plan, scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that hot queries use an index')
+    parser.add_argument('--database-url', help='scratch database to migrate, seed and EXPLAIN against')
+    parser.add_argument('--verbose', action='store_true', help='print the full plan for every query')
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(tmpdir.name, "explain.db")}'
+
+    from flask_migrate import upgrade
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+
+    failures = []
+    with app.app_context():
+        upgrade(directory=os.path.join(app.root_path, 'migrations'))
+        seed(db)
+
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            db.session.execute(db.text('ANALYZE'))
+            explain = full_scans_sqlite
+        elif dialect in ('mysql', 'mariadb'):
+            db.session.execute(db.text('ANALYZE TABLE users, products, orders, order_product'))
+            explain = full_scans_mysql
+        else:
+            print(f'Unsupported dialect: {dialect}')
+            return 2
+
+        for name, query in hot_queries(dialect):
+            plan, scans = explain(db, compile_sql(db, query))
+            status = 'FULL SCAN' if scans else 'ok'
+            print(f'{name:<24} {status}')
+            if args.verbose or scans:
+                for line in plan:
+                    print(f'    {line}')
+            if scans:
+                failures.append(name)
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+    if failures:
+        print(f'\nFull table scans in: {", ".join(failures)}')
+        return 1
+    print('\nAll hot queries use an index')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
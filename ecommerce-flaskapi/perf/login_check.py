@@ -0,0 +1,84 @@
+# Check that ordinary concurrent logins get through the password hashing cap
+#
+# Registers one user per client thread on a throwaway SQLite database, then
+# has --concurrency threads log in --logins times each through the Flask
+# test client, with the default hashing settings (production cost, one slot
+# per CPU, PASSWORD_HASH_WAIT). Fails when any register or login is not
+# answered with success, e.g. 503 because no hashing slot freed up in time.
+#
+# Usage:
+#   python perf/login_check.py
+#   python perf/login_check.py --concurrency 8 --logins 10
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'login-check-password'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent logins through the password hashing cap')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads')
+    parser.add_argument('--logins', type=int, default=5, help='logins per thread')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(tmpdir.name, "login.db")}'
+    # Slots of their own, so a server running on this host doesn't take them
+    os.environ['PASSWORD_HASH_LOCK_DIR'] = os.path.join(tmpdir.name, 'hash-slots')
+    os.environ['RATE_LIMIT_BACKEND'] = 'none'
+
+    from app import create_app
+    from extensions import db, password_hasher
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        slots, wait = app.config['PASSWORD_HASH_MAX_CONCURRENT'], app.config['PASSWORD_HASH_WAIT']
+
+    failures = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def client_thread(n):
+        client = app.test_client()
+        email = f'user{n}@example.com'
+        requests = [('/register', {'name': f'User {n}', 'email': email, 'password': PASSWORD})]
+        requests += [('/login', {'email': email, 'password': PASSWORD})] * args.logins
+        for path, body in requests:
+            response = client.post(path, json=body)
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code >= 400:
+                    failures.append(f'{path} for {email} returned {response.status_code}')
+
+    threads = [threading.Thread(target=client_thread, args=(n,)) for n in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        password_hasher.shutdown()
+    tmpdir.cleanup()
+
+    total = args.concurrency * (args.logins + 1)
+    print(f'{total} requests from {args.concurrency} threads in {elapsed:.1f}s '
+          f'({slots} hashing slots, {wait}s wait): {dict(sorted(statuses.items()))}')
+    if failures:
+        print('\nLogin check failed:')
+        print('\n'.join(f'  - {f}' for f in failures[:20]))
+        return 1
+    print('\nConcurrent registers and logins all succeeded')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# Consistency check for the order write paths
+#
+# Runs order writes through the Flask test client on a throwaway SQLite
+# database and fails when:
+#   - add_product lets a line grow past ORDER_LINE_MAX_QUANTITY, or leaves
+#     the order's stored total or the sales rollups counting a rejected add
+#   - after a mix of order and product writes, the stored totals, user
+#     summaries and sales rollups differ from what rebuild-order-totals
+#     computes from the line items, or deleted products keep rollup rows
+#
+# Usage:
+#   python perf/order_write_check.py
+import os
+import sys
+
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+os.environ.setdefault('PRODUCT_CACHE_BACKEND', 'none')
+os.environ.setdefault('USER_CACHE_BACKEND', 'none')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+
+from app import create_app
+from extensions import db
+from jobs import run_next_job
+from models import User, Product, Order, UserOrderSummary, DailySales, ProductSales, order_product
+from order_totals import rebuild_order_totals
+
+MAX_QUANTITY = 5
+
+app = create_app({'ORDER_LINE_MAX_QUANTITY': MAX_QUANTITY})
+
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(name='User', address='', email='user@example.com', password='x'))
+    db.session.add_all([Product(product_name=f'Product {i}', price=price) for i, price in enumerate((2.5, 19.99, 0.1))])
+    db.session.flush()
+    db.session.add(Order(user_id=1))
+    db.session.commit()
+    # Summaries and rollups for the empty order, as POST /orders would leave them
+    rebuild_order_totals()
+
+
+# Adds up to the cap in two requests, then checks one more unit is refused
+# and leaves nothing behind
+def check_line_quantity_cap(client):
+    problems = []
+    for quantity in (MAX_QUANTITY - 2, 2):
+        response = client.put(f'/orders/1/add_product/1?quantity={quantity}')
+        if response.status_code != 200:
+            problems.append(f'adding {quantity} below the cap returned {response.status_code}')
+
+    response = client.put('/orders/1/add_product/1?quantity=1')
+    if response.status_code != 400:
+        problems.append(f'adding past the cap returned {response.status_code}, not 400')
+
+    line_quantity = db.session.execute(select(order_product.c.quantity)).scalar_one()
+    if line_quantity != MAX_QUANTITY:
+        problems.append(f'the line holds {line_quantity} units, not {MAX_QUANTITY}')
+    total = client.get('/orders/1/total').get_json()['total_price']
+    if total != MAX_QUANTITY * 2.5:
+        problems.append(f'the stored total is {total}, not {MAX_QUANTITY * 2.5}')
+    top = client.get('/analytics/top_products?limit=1').get_json()['products']
+    if [product['units'] for product in top] != [MAX_QUANTITY]:
+        problems.append(f'product_sales counts {top} units, not {MAX_QUANTITY}')
+    return problems
+
+
+# Everything rebuild-order-totals recomputes, in a comparable form. A day's
+# slot rows are summed, and zero summaries (users and products whose orders
+# were all deleted) count as missing, as they read the same.
+def derived_state():
+    def rounded(rows):
+        return {key: tuple(round(value, 2) for value in values) for key, *values in rows}
+
+    return {
+        'orders': rounded(db.session.execute(select(Order.id, Order.item_count, Order.total_price)).all()),
+        'user_order_summaries': rounded(db.session.execute(
+            select(UserOrderSummary.user_id, UserOrderSummary.order_count, UserOrderSummary.total_spent)
+            .where(UserOrderSummary.order_count != 0)
+        ).all()),
+        'daily_sales': rounded(db.session.execute(
+            select(DailySales.day, func.sum(DailySales.order_count), func.sum(DailySales.units),
+                   func.sum(DailySales.revenue))
+            .group_by(DailySales.day)
+        ).all()),
+        'product_sales': rounded(db.session.execute(
+            select(ProductSales.product_id, ProductSales.units, ProductSales.revenue)
+            .where(ProductSales.units != 0)
+        ).all()),
+    }
+
+
+# Creates, changes and deletes orders and products through the API, then
+# compares the incrementally kept totals and rollups with a rebuild
+def check_rollups_match_rebuild(client):
+    writes = [
+        ('POST', '/orders', {'user_id': 1, 'items': [{'product_id': 1, 'quantity': 2}, {'product_id': 2}]}),
+        ('POST', '/orders', {'user_id': 1, 'items': [{'product_id': 2, 'quantity': 3}, {'product_id': 3}]}),
+        ('POST', '/orders', {'user_id': 1, 'product_ids': [1, 3]}),
+        ('PUT', '/orders/2/add_product/3?quantity=2', None),
+        ('PUT', '/orders/2/add_product/1', None),
+        ('DELETE', '/orders/2/remove_product/2?quantity=1', None),
+        ('DELETE', '/orders/3/remove_product/3', None),
+        ('PUT', '/orders/3', {'items': [{'product_id': 2, 'quantity': 4}]}),
+        ('DELETE', '/orders/4', None),
+        ('POST', '/orders', {'user_id': 1, 'items': [{'product_id': 1}, {'product_id': 3, 'quantity': 3}]}),
+        ('DELETE', '/products/3', None),
+        ('DELETE', '/products/delete_multiple', {'product_ids': [1]}),
+    ]
+    problems = []
+    for method, url, body in writes:
+        response = client.open(url, method=method, json=body)
+        if response.status_code >= 400:
+            problems.append(f'{method} {url} returned {response.status_code}: {response.get_data(as_text=True)}')
+    while run_next_job():
+        pass
+
+    orphans = db.session.execute(
+        select(ProductSales.product_id).where(ProductSales.product_id.not_in(select(Product.id)))
+    ).scalars().all()
+    if orphans:
+        problems.append(f'deleted products {orphans} still have product_sales rows')
+
+    kept = derived_state()
+    rebuild_order_totals()
+    rebuilt = derived_state()
+    for name, rows in kept.items():
+        if rows != rebuilt[name]:
+            problems.append(f'{name} is {rows}, a rebuild gives {rebuilt[name]}')
+    return problems
+
+
+CHECKS = [check_line_quantity_cap, check_rollups_match_rebuild]
+
+
+def main():
+    client = app.test_client()
+    failures = []
+    for check in CHECKS:
+        with app.app_context():
+            seed()
+            problems = check(client)
+        status = 'FAILED' if problems else 'ok'
+        print(f'{check.__name__:<28} {status}')
+        failures.extend(f'{check.__name__}: {problem}' for problem in problems)
+
+    if failures:
+        print('\nOrder write check failed:')
+        print('\n'.join(f'  - {f}' for f in failures))
+        return 1
+    print('\nOrder writes keep quantities, totals and rollups consistent')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# Query-count regression check for the read endpoints
+#
+# Seeds a throwaway SQLite database twice (small and large order history),
+# hits every endpoint through the Flask test client and counts the SQL
+# statements each request emits. Fails when:
+#   - a count changes between the small and large seed (an N+1 crept in), or
+#   - a count goes above the budget stored in query_budget.json
+#
+# Usage:
+#   python perf/query_counts.py            # check against the budget
+#   python perf/query_counts.py --update   # rewrite the budget after an intended change
+import argparse
+import json
+import os
+import sys
+
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+# Measure the database work itself, not cache hits
+os.environ.setdefault('PRODUCT_CACHE_BACKEND', 'none')
+os.environ.setdefault('USER_CACHE_BACKEND', 'none')
+# One process: no invalidation log (its once-a-second read would make the
+# counts depend on timing)
+os.environ.setdefault('CACHE_SYNC_INTERVAL', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert
+
+from app import create_app
+from extensions import db, search_index
+from jobs import enqueue_job
+from models import User, Product, Order, order_product
+from order_totals import rebuild_order_totals
+from products import load_search_rows
+
+app = create_app()
+
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_budget.json')
+
+# (name, method, url) - ids refer to rows created by seed()
+ENDPOINTS = [
+    ('get_users', 'GET', '/users'),
+    ('get_user', 'GET', '/users/1'),
+    ('get_products', 'GET', '/products?page=1&per_page=20'),
+    ('get_products_cursor', 'GET', '/products?limit=20'),
+    ('get_product', 'GET', '/products/1'),
+    ('get_orders', 'GET', '/orders'),
+    ('get_order', 'GET', '/orders/1'),
+    ('get_orders_by_user', 'GET', '/orders/user/1'),
+    ('get_orders_by_user_expanded', 'GET', '/orders/user/1?expand=products,total'),
+    ('get_order_expanded', 'GET', '/orders/1?expand=products,total'),
+    ('get_products_in_order', 'GET', '/orders/1/products'),
+    ('calculate_order_total', 'GET', '/orders/1/total'),
+    ('get_user_order_stats', 'GET', '/users/1/order_stats'),
+    ('get_bulk_user_order_stats', 'GET', '/users/order_stats?ids=1,2,3,999'),
+    ('get_orders_by_product', 'GET', '/products/1/orders'),
+    ('get_users_by_product', 'GET', '/products/1/users'),
+    ('search_products', 'GET', '/products/search?q=product&limit=20'),
+    ('filter_orders_by_date', 'GET', '/orders/filter?start_date=2000-01-01&end_date=2100-01-01'),
+    ('get_sales_analytics', 'GET', '/analytics/sales?granularity=week&start=2000-01-01&end=2100-01-01'),
+    ('get_top_products', 'GET', '/analytics/top_products?limit=10'),
+    ('get_job', 'GET', '/jobs/1'),
+]
+
+# Small and large seeds: users, products, orders per user, products per order
+SEEDS = [(3, 10, 2, 3), (20, 50, 10, 8)]
+
+
+def seed(users, products, orders_per_user, products_per_order):
+    db.drop_all()
+    db.create_all()
+    db.session.add_all([
+        User(name=f'User {i}', address='', email=f'user{i}@example.com', password='x')
+        for i in range(users)
+    ])
+    db.session.add_all([Product(product_name=f'Product {i}', price=i + 0.99) for i in range(products)])
+    db.session.flush()
+    db.session.add_all([Order(user_id=u + 1) for u in range(users) for _ in range(orders_per_user)])
+    db.session.flush()
+
+    rows = []
+    for order_id in range(1, users * orders_per_user + 1):
+        # Every order contains product 1 so the per-product endpoints fan out
+        picked = {1} | {(order_id + k) % products + 1 for k in range(products_per_order - 1)}
+        rows.extend({'order_id': order_id, 'product_id': p} for p in picked)
+    db.session.execute(insert(order_product), rows)
+    enqueue_job('delete_products', {'product_ids': [1]}, total=1)
+    db.session.commit()
+    # Stored totals and sales rollups, as the order endpoints would have left them
+    rebuild_order_totals()
+
+    # Build the in-memory search index up front so search is measured warm
+    search_index.invalidate()
+    search_index.sync(load_search_rows, load_search_rows)
+
+
+def count_queries(client, engine, method, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.open(url, method=method)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method} {url} returned {response.status_code}: {response.get_data(as_text=True)}')
+    return len(statements)
+
+
+def measure():
+    results = []
+    client = app.test_client()
+    for sizes in SEEDS:
+        with app.app_context():
+            seed(*sizes)
+            engine = db.engine
+        results.append({name: count_queries(client, engine, method, url) for name, method, url in ENDPOINTS})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check per-endpoint SQL query counts')
+    parser.add_argument('--update', action='store_true', help='write the measured counts as the new budget')
+    args = parser.parse_args()
+
+    small, large = measure()
+    failures = []
+
+    for name, _, _ in ENDPOINTS:
+        if small[name] != large[name]:
+            failures.append(f'{name}: {small[name]} queries on the small seed but {large[name]} on the large one')
+
+    if args.update:
+        if failures:
+            print('\n'.join(failures))
+            print('Not updating the budget while counts depend on data size')
+            return 1
+        with open(BUDGET_FILE, 'w') as f:
+            json.dump(large, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Wrote {len(large)} budgets to {BUDGET_FILE}')
+        return 0
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+
+    for name, _, _ in ENDPOINTS:
+        allowed = budget.get(name)
+        status = 'ok'
+        if allowed is None:
+            failures.append(f'{name}: no budget recorded (run with --update)')
+            status = 'missing'
+        elif large[name] > allowed:
+            failures.append(f'{name}: {large[name]} queries, budget is {allowed}')
+            status = 'OVER'
+        print(f'{name:<28} {large[name]:>3} / {allowed if allowed is not None else "-":>3}  {status}')
+
+    if failures:
+        print('\nQuery count check failed:')
+        print('\n'.join(f'  - {f}' for f in failures))
+        return 1
+    print('\nAll endpoints within their query budget')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
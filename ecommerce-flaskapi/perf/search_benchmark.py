@@ -0,0 +1,156 @@
+# Latency check for GET /products/search on a large catalog
+#
+# Seeds a synthetic catalog (brand + adjective + noun + model number, so
+# some words are shared by thousands of products), then times a mix of
+# searches through the Flask test client: single words, short prefixes,
+# multi-word queries, price filters and a follow-up cursor page. The queries
+# are taken from seeded products, so every one but 'no match' must find
+# something. Fails when a query finds nothing or its p95 goes over
+# --budget-ms.
+#
+# Usage:
+#   python perf/search_benchmark.py                         # 1M products, SQLite + in-memory index
+#   python perf/search_benchmark.py --products 100000
+#   python perf/search_benchmark.py --database-url mysql+mysqlconnector://...  # FULLTEXT on a scratch db
+#
+# The target database is upgraded and filled with test rows, so never point
+# it at a database you care about.
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEED_BATCH = 50000
+
+
+def make_vocabulary(rng, count):
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))))
+    return sorted(words)
+
+
+# Returns the first few seeded rows, for query_mix to search for
+def seed(db, products, rng):
+    from sqlalchemy import insert
+    from models import Product
+
+    vocabulary = make_vocabulary(rng, 20000)
+    brands, nouns, adjectives = vocabulary[:200], vocabulary[200:2200], vocabulary[2200:]
+    samples = []
+    for start in range(0, products, SEED_BATCH):
+        rows = [
+            {
+                'product_name': f'{rng.choice(brands)} {rng.choice(adjectives)} {rng.choice(nouns)} {rng.randint(1, 999)}',
+                'price': round(rng.uniform(1, 1000), 2)
+            }
+            for _ in range(start, min(start + SEED_BATCH, products))
+        ]
+        db.session.execute(insert(Product), rows)
+        db.session.commit()
+        samples = samples or rows[:7]
+    return samples
+
+
+# Words of one seeded product per query (brand, adjective, noun), so the
+# multi-word queries match that product at least
+def query_mix(samples):
+    names = [row['product_name'].split() for row in samples]
+    priced = samples[6]
+    return [
+        ('brand word', f'q={names[0][0]}'),
+        ('noun word', f'q={names[1][2]}'),
+        ('3-letter prefix', f'q={names[2][0][:3]}'),
+        ('2-letter prefix', f'q={names[3][2][:2]}'),
+        ('two words', f'q={names[4][0]}+{names[4][2][:4]}'),
+        ('three words', f'q={names[5][0]}+{names[5][1]}+{names[5][2]}'),
+        ('price range', f'q={names[6][0]}&min_price={int(priced["price"])}&max_price={int(priced["price"]) + 100}'),
+        ('no match', 'q=zzzzzzzzzz'),
+    ]
+
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {url} returned {response.status_code}: {response.get_data(as_text=True)}')
+    return elapsed, response.json
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time product search on a large catalog')
+    parser.add_argument('--database-url', help='scratch database to migrate, seed and search')
+    parser.add_argument('--products', type=int, default=1000000, help='products to seed')
+    parser.add_argument('--repeat', type=int, default=50, help='timed runs per query')
+    parser.add_argument('--budget-ms', type=float, default=10, help='allowed p95 per query')
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(tmpdir.name, "search.db")}'
+
+    from flask_migrate import upgrade
+    from app import create_app
+    from extensions import db
+    from products import search_backend
+
+    app = create_app()
+
+    failures = []
+    with app.app_context():
+        upgrade(directory=os.path.join(app.root_path, 'migrations'))
+        start = time.perf_counter()
+        samples = seed(db, args.products, random.Random(42))
+        print(f'Seeded {args.products} products in {time.perf_counter() - start:.1f}s')
+        backend = search_backend()
+
+    client = app.test_client()
+    # The first search builds the in-memory index (memory backend only)
+    elapsed, _ = timed_get(client, '/products/search?q=warmup')
+    print(f'Backend: {backend}, first search {elapsed:.2f}s\n')
+
+    empty = []
+    for name, query in query_mix(samples):
+        url = f'/products/search?{query}&limit=20'
+        _, page = timed_get(client, url)
+        if not page['products'] and name != 'no match':
+            empty.append(name)
+        cursor = page['pagination']['next_cursor']
+        for label, target in ((name, url), (f'{name}, page 2', f'{url}&after={cursor}' if cursor else None)):
+            if target is None:
+                continue
+            timings = sorted(timed_get(client, target)[0] for _ in range(args.repeat))
+            p50, p95 = percentile(timings, 0.50), percentile(timings, 0.95)
+            status = 'ok' if p95 <= args.budget_ms else 'SLOW'
+            print(f'{label:<24} hits {len(page["products"]):>3}  p50 {p50:6.2f} ms  p95 {p95:6.2f} ms  {status}')
+            if p95 > args.budget_ms:
+                failures.append(label)
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+    if empty:
+        print(f'\nNo hits for seeded words: {", ".join(empty)}')
+    if failures:
+        print(f'\nOver the {args.budget_ms} ms p95 budget: {", ".join(failures)}')
+    if empty or failures:
+        return 1
+    print(f'\nAll searches within {args.budget_ms} ms at p95')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# Byte-for-byte parity check for the fast serialization path
+#
+# Seeds a throwaway SQLite database with awkward values (non-ASCII text,
+# floats Python prints in exponent form, microsecond timestamps, empty
+# strings) and checks, for every model, that
+#   RowSerializer over select(...) column tuples
+# encodes to exactly the same bytes as
+#   the Marshmallow schema over ORM objects
+# with both the default JSON provider and the orjson provider.
+#
+# Usage:
+#   python perf/serializer_parity.py
+import os
+import sys
+from datetime import datetime
+
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+os.environ.setdefault('PRODUCT_CACHE_BACKEND', 'none')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import insert, select
+
+from app import create_app
+from extensions import db
+from models import User, Product, Order
+from schemas import users_schema, orders_schema, products_schema, user_rows, order_rows, product_rows
+from serializers import OrjsonProvider
+
+app = create_app()
+
+PRODUCTS = [
+    ('Café crème', 1.5), ('tiny', 0.00001), ('huge', 1e16), ('whole', 3.0),
+    ('1e5 widgets', 2.25), ('rounding', 0.1 + 0.2), ('', 0.0), ('snow ☃', 19.99),
+]
+USERS = [('Zoë', 'Straße 1'), ('Bob', ''), ('"quoted" \\ name', 'tab\there')]
+ORDER_DATES = [datetime(2024, 1, 2, 3, 4, 5, 123456), datetime(2024, 2, 29), datetime(1999, 12, 31, 23, 59, 59)]
+
+CASES = [
+    ('users', User, users_schema, user_rows),
+    ('orders', Order, orders_schema, order_rows),
+    ('products', Product, products_schema, product_rows),
+]
+
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(User), [
+        {'name': name, 'address': address, 'email': f'user{i}@example.com', 'password': 'x'}
+        for i, (name, address) in enumerate(USERS)
+    ])
+    db.session.execute(insert(Product), [{'product_name': n, 'price': p} for n, p in PRODUCTS])
+    db.session.execute(insert(Order), [
+        {'user_id': i % len(USERS) + 1, 'order_date': d} for i, d in enumerate(ORDER_DATES)
+    ])
+    db.session.commit()
+
+
+def encode(provider, data):
+    return provider.response(data).get_data()
+
+
+def main():
+    failures = []
+    providers = [('default', DefaultJSONProvider(app)), ('orjson', OrjsonProvider(app))]
+
+    with app.app_context():
+        seed()
+        for name, model, schema, rows in CASES:
+            objects = db.session.execute(select(model).order_by(model.id)).scalars().all()
+            columns = db.session.execute(select(*rows.columns).order_by(model.id)).all()
+            expected = encode(providers[0][1], schema.dump(objects))
+
+            # The whole list, then each row alone so one awkward value
+            # can't hide behind another that forces a fallback
+            pairs = [(expected, rows.dump(columns))] + [
+                (encode(providers[0][1], schema.dump([obj])), rows.dump([row]))
+                for obj, row in zip(objects, columns)
+            ]
+            for provider_name, provider in providers:
+                mismatches = [
+                    (want, encode(provider, data)) for want, data in pairs
+                    if encode(provider, data) != want
+                ]
+                print(f'{name:<10} {provider_name:<8} {"MISMATCH" if mismatches else "ok"}')
+                for want, got in mismatches:
+                    failures.append(f'{name} ({provider_name}):\n    expected {want!r}\n    got      {got!r}')
+
+    if failures:
+        print('\nSerializer output differs from the Marshmallow schemas:')
+        print('\n'.join(f'  - {f}' for f in failures))
+        return 1
+    print('\nFast serializers match the Marshmallow schemas byte for byte')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+# MySQL stand-in for the serving-mode benchmark
+#
+# Serves the real app (WSGI or ASGI) on a SQLite file, adding a fixed delay
+# to every SQL statement so requests spend their time waiting on "the
+# database" the way they wait on network round trips to MySQL. The delay
+# sleeps in the thread that runs the statement: a sync worker's request
+# thread, or aiosqlite's connection thread for the async engine, which
+# leaves the event loop free just like a real async driver would.
+#
+# Loaded by async_benchmark.py through gunicorn / uvicorn:
+#   gunicorn --pythonpath perf standin:wsgi_app
+#   uvicorn --app-dir perf standin:asgi_app
+#
+# STANDIN_LATENCY_MS sets the per-statement delay. SQLALCHEMY_DATABASE_URI
+# must be a SQLite file URL with ?check_same_thread=false, because aiosqlite
+# opens connections on its own thread.
+import os
+import time
+
+from sqlalchemy import event
+
+LATENCY = float(os.environ.get('STANDIN_LATENCY_MS', 0)) / 1000
+
+
+def add_latency(engine):
+    def delay(statement):
+        time.sleep(LATENCY)
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        # aiosqlite wraps the sqlite3 connection that actually runs statements
+        driver_connection = getattr(dbapi_connection, 'driver_connection', dbapi_connection)
+        raw = getattr(driver_connection, '_conn', driver_connection)
+        raw.set_trace_callback(delay if LATENCY else None)
+
+
+from extensions import db  # noqa: E402
+from asgi import app, async_engine, flask_app  # noqa: E402
+
+with flask_app.app_context():
+    add_latency(db.engine)
+add_latency(async_engine.sync_engine)
+
+wsgi_app = flask_app
+asgi_app = app
@@ -0,0 +1,206 @@
+# Startup-time benchmark: how quickly a new worker can serve requests
+#
+# Two measurements, both against a migrated scratch SQLite database:
+#
+#   process  - fresh interpreters timing each startup phase: importing the
+#              app module, create_app(), the first request (which builds the
+#              lazy schemas) and a steady-state request
+#   gunicorn - boots gunicorn with and without preload_app and records, per
+#              worker, the time from fork to ready (post_fork ->
+#              post_worker_init), the time until every worker is ready, and
+#              how long a worker added with TTIN (autoscaling) takes to be ready
+#
+# Usage:
+#   python perf/startup_benchmark.py
+#   python perf/startup_benchmark.py --runs 10 --workers 8 --scale-ups 5
+#   python perf/startup_benchmark.py --only process
+import argparse
+import glob
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PHASES_SCRIPT = '''
+import json, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app()
+created = time.perf_counter()
+client = app.test_client()
+assert client.get('/products?limit=20').status_code == 200
+first = time.perf_counter()
+assert client.get('/products?limit=20').status_code == 200
+steady = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': first - created,
+    'steady_request': steady - first,
+}))
+'''
+
+# Wraps the repo's gunicorn.conf.py, adding hooks that timestamp each worker
+GUNICORN_CONFIG = '''
+import os, time
+exec(open({repo_config!r}).read())
+_post_fork = post_fork
+
+
+def _stamp(kind, pid):
+    with open(os.path.join({stamp_dir!r}, f'{{kind}}-{{pid}}'), 'w') as f:
+        f.write(repr(time.time()))
+
+
+def post_fork(server, worker):
+    _stamp('fork', worker.pid)
+    _post_fork(server, worker)
+
+
+def post_worker_init(worker):
+    _stamp('ready', worker.pid)
+'''
+
+
+def migrate(env):
+    script = (
+        'from flask_migrate import upgrade\n'
+        'from app import create_app\n'
+        'with create_app().app_context():\n'
+        '    upgrade(directory="migrations")\n'
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def measure_process(env, runs):
+    phases = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', PHASES_SCRIPT], cwd=BACKEND_DIR, env=env,
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['process_total'] = time.perf_counter() - started
+        phases.append(result)
+    return {name: statistics.median(run[name] for run in phases) for name in phases[0]}
+
+
+def read_stamps(stamp_dir, kind):
+    stamps = {}
+    for path in glob.glob(os.path.join(stamp_dir, f'{kind}-*')):
+        with open(path) as f:
+            content = f.read()
+        if content:
+            stamps[int(path.rsplit('-', 1)[1])] = float(content)
+    return stamps
+
+
+def wait_for(condition, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.005)
+    raise RuntimeError('timed out waiting for gunicorn workers')
+
+
+def measure_gunicorn(env, preload, workers, scale_ups):
+    with tempfile.TemporaryDirectory() as tmp:
+        stamp_dir = os.path.join(tmp, 'stamps')
+        os.makedirs(stamp_dir)
+        config_path = os.path.join(tmp, 'gunicorn.conf.py')
+        with open(config_path, 'w') as f:
+            f.write(GUNICORN_CONFIG.format(
+                repo_config=os.path.join(BACKEND_DIR, 'gunicorn.conf.py'), stamp_dir=stamp_dir
+            ))
+
+        started = time.time()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', config_path, '--bind', '127.0.0.1:0',
+             '--workers', str(workers), '--log-level', 'warning', 'app:create_app()'],
+            cwd=BACKEND_DIR,
+            env=dict(env, GUNICORN_PRELOAD='1' if preload else '0',
+                     PROMETHEUS_MULTIPROC_DIR=os.path.join(tmp, 'metrics'))
+        )
+        try:
+            ready = wait_for(lambda: len(read_stamps(stamp_dir, 'ready')) >= workers and read_stamps(stamp_dir, 'ready'))
+            forks = read_stamps(stamp_dir, 'fork')
+            boot = max(ready.values()) - started
+            fork_to_ready = [ready[pid] - forks[pid] for pid in ready]
+
+            scale_up = []
+            for count in range(workers + 1, workers + scale_ups + 1):
+                sent = time.time()
+                process.send_signal(signal.SIGTTIN)
+                ready = wait_for(lambda: len(read_stamps(stamp_dir, 'ready')) >= count and read_stamps(stamp_dir, 'ready'))
+                scale_up.append(max(ready.values()) - sent)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    return {
+        'boot_all_ready': boot,
+        'fork_to_ready': statistics.median(fork_to_ready),
+        'scale_up_ready': statistics.median(scale_up) if scale_up else None,
+    }
+
+
+def ms(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:8.1f} ms'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app startup and gunicorn worker boot times')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per phase measurement')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers to boot')
+    parser.add_argument('--scale-ups', type=int, default=3, help='workers to add one at a time with TTIN')
+    parser.add_argument('--only', choices=('process', 'gunicorn'), help='run one of the two measurements')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.join(tmp, "startup.db")}',
+            PRODUCT_CACHE_BACKEND='none',
+            PASSWORD_HASH_LOCK_DIR=os.path.join(tmp, 'hash-slots'),
+        )
+        env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        migrate(env)
+
+        if args.only != 'gunicorn':
+            results['process'] = measure_process(env, args.runs)
+            print(f'Startup phases (median of {args.runs} fresh interpreters)')
+            for name, seconds in results['process'].items():
+                print(f'  {name:<16} {ms(seconds)}')
+            print()
+
+        if args.only != 'process':
+            results['gunicorn'] = {}
+            print(f'gunicorn, {args.workers} workers')
+            for preload in (False, True):
+                label = 'preload' if preload else 'no preload'
+                timings = measure_gunicorn(env, preload, args.workers, args.scale_ups)
+                results['gunicorn'][label] = timings
+                print(f'  {label:<11} all ready {ms(timings["boot_all_ready"])}  '
+                      f'fork->ready {ms(timings["fork_to_ready"])}  '
+                      f'TTIN->ready {ms(timings["scale_up_ready"])}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# Connection pool configuration and metrics for the MySQL engines
+#
+# Engine options come from the environment so each deployment can size the
+# pool for its worker count. InstrumentedQueuePool (and its asyncio twin used
+# by asgi.py) times how long requests wait for a connection; the live pool
+# state (checked out, overflow) is read straight from the pool when metrics
+# are requested.
+import os
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.wait_buckets = [0] * len(WAIT_BUCKETS)
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+
+    def snapshot(self, pool=None):
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            stats = {
+                'checkouts': self.checkouts,
+                'checkout_timeouts': self.timeouts,
+                'checkout_wait_seconds_total': round(self.wait_total, 6),
+                'checkout_wait_seconds_avg': round(self.wait_total / waits, 6) if waits else 0.0,
+                'checkout_wait_seconds_max': round(self.wait_max, 6),
+                # Cumulative counts, Prometheus style: waits <= bound
+                'checkout_wait_buckets': {str(b): c for b, c in zip(WAIT_BUCKETS, self.wait_buckets)}
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'max_overflow': pool._max_overflow
+            })
+        return stats
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    # _do_get is where QueuePool blocks when every connection is in use
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+
+# The async engine's pool waits on an asyncio queue but has the same _do_get
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options_from_env(database_uri, is_async=False):
+    # SQLite (local runs and perf scripts) uses its own pools, which reject
+    # the QueuePool sizing arguments
+    if database_uri.startswith('sqlite'):
+        return {}
+
+    return {
+        'poolclass': InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        # Recycle well before MySQL's wait_timeout closes idle connections
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        # Cheap liveness check on checkout so a dropped connection is
+        # replaced instead of failing the request
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True)
+    }
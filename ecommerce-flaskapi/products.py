@@ -0,0 +1,583 @@
+# Product endpoints: catalog reads, search, writes and bulk writes
+import base64
+import json
+import time
+from itertools import islice
+
+from flask import Blueprint, current_app, request, jsonify
+from marshmallow import ValidationError
+from sqlalchemy import func, select, insert, update, delete, or_, and_
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.exc import SQLAlchemyError
+
+from etags import make_etag, conditional_response, allow_shared_caching
+from extensions import db, cache_invalidations, edge_cache, product_cache, search_index
+from invalidations import invalidation_handler
+from jobs import enqueue_job, job_accepted_response, job_handler
+from models import Product
+from order_totals import delete_product_sales, upsert_statement, remove_products_from_orders
+from schemas import product_schema, products_schema, product_rows
+from search import tokenize, encode_search_cursor, decode_search_cursor
+from serializers import RowPagination
+
+products_bp = Blueprint('products', __name__)
+
+
+# ----- Product Endpoints -----
+
+# Cursors are opaque to clients: base64 of the last product id seen
+def encode_cursor(last_id):
+    raw = json.dumps({'id': last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))['id']
+    except (ValueError, TypeError, KeyError):
+        return None
+    return last_id if isinstance(last_id, int) else None
+
+# Total product count, cached per worker so cursor pages skip COUNT(*)
+_product_count_cache = {'value': None, 'expires_at': 0.0}
+
+def peek_product_count():
+    if time.monotonic() >= _product_count_cache['expires_at']:
+        return None
+    return _product_count_cache['value']
+
+def store_product_count(total):
+    _product_count_cache['value'] = total
+    _product_count_cache['expires_at'] = time.monotonic() + current_app.config['PRODUCT_COUNT_CACHE_TTL']
+    return total
+
+def invalidate_product_count():
+    _product_count_cache['value'] = None
+    _product_count_cache['expires_at'] = 0.0
+
+def product_count_query():
+    return select(func.count()).select_from(Product)
+
+# Drops products from this process's caches; None drops them all. Other
+# processes call it for the writes they read from cache_invalidations.
+@invalidation_handler('products')
+def forget_products(product_ids):
+    invalidate_product_count()
+    if product_ids is None:
+        product_cache.invalidate_all()
+        search_index.invalidate()
+        return
+    product_ids = [int(product_id) for product_id in product_ids]
+    product_cache.invalidate_products(product_ids)
+    search_index.mark_stale(product_ids)
+
+# Bulk creates add ids the index has never seen: rebuild it on the next search
+@invalidation_handler('search_index')
+def rebuild_search_index(keys=None):
+    search_index.invalidate()
+
+# Called by every product write, after its commit, so cached payloads and
+# pages never go stale in this process or (within CACHE_SYNC_INTERVAL) the others
+def invalidate_products(product_ids=()):
+    forget_products(product_ids)
+    cache_invalidations.record('products', product_ids)
+    edge_cache.purge(f'/products/{product_id}' for product_id in product_ids)
+
+# GET /products is planned as (rows query, count query or None, build), where
+# build(rows, total) returns the payload. The WSGI view and asgi.py run the
+# same queries on their own engines and so return identical pages.
+
+# Keyset pagination: seek past the last id instead of OFFSET scanning
+def plan_products_after_cursor(args):
+    limit = args.get('limit', 10, type=int)
+    cursor = args.get('after')
+
+    if limit < 1:
+        return None, ({'message': 'limit must be a positive integer'}, 400)
+
+    if limit > 100:
+        return None, ({'message': 'limit cannot exceed 100'}, 400)
+
+    query = select(*product_rows.columns).order_by(Product.id)
+    if cursor:
+        last_id = decode_cursor(cursor)
+        if last_id is None:
+            return None, ({'message': 'Invalid cursor'}, 400)
+        query = query.where(Product.id > last_id)
+
+    include_total = args.get('include_total', 'false').lower() == 'true'
+    cached_total = peek_product_count() if include_total else None
+    count_query = product_count_query() if include_total and cached_total is None else None
+
+    def build(products, total):
+        # One extra row was fetched to know whether another page exists
+        has_next = len(products) > limit
+        products = products[:limit]
+
+        pagination = {
+            'limit': limit,
+            'has_next': has_next,
+            'next_cursor': encode_cursor(products[-1].id) if has_next else None
+        }
+        if include_total:
+            pagination['total_items'] = cached_total if total is None else store_product_count(total)
+
+        return {
+            'products': product_rows.dump(products),
+            'pagination': pagination
+        }
+
+    return (query.limit(limit + 1), count_query, build), None
+
+def plan_products_page(args):
+    # Get pagination parameters
+    page = args.get('page', 1, type=int)
+    per_page = args.get('per_page', 10, type=int)
+
+    # Validate pagination parameters
+    if page < 1 or per_page < 1:
+        return None, ({'message': 'Page and per_page must be positive integers'}, 400)
+
+    if per_page > 100:
+        return None, ({'message': 'per_page cannot exceed 100'}, 400)
+
+    query = select(*product_rows.columns).limit(per_page).offset((page - 1) * per_page)
+
+    def build(products, total):
+        # Same math as db.paginate, but the items are column rows
+        pagination = RowPagination(
+            rows=products, total=total, page=page, per_page=per_page, error_out=False
+        )
+        return {
+            'products': product_rows.dump(pagination.items),
+            'pagination': {
+                'page': pagination.page,
+                'per_page': pagination.per_page,
+                'total_pages': pagination.pages,
+                'total_items': pagination.total,
+                'has_next': pagination.has_next,
+                'has_prev': pagination.has_prev,
+                'next_page': pagination.next_num if pagination.has_next else None,
+                'prev_page': pagination.prev_num if pagination.has_prev else None
+            }
+        }
+
+    return (query, product_count_query(), build), None
+
+def plan_products_request(args):
+    # Cursor mode when the client sends after/limit, page mode otherwise
+    if 'after' in args or 'limit' in args:
+        return plan_products_after_cursor(args)
+    return plan_products_page(args)
+
+def cache_entry(payload):
+    return {'etag': make_etag(payload), 'body': payload}
+
+# Retrieve all products
+@products_bp.route('/products', methods=['GET'])
+def get_products():
+    # Serve the whole page from cache when nothing has been written since
+    cache_key = product_cache.page_key(request.args.to_dict())
+    cached = product_cache.get_page(cache_key)
+    if cached is None:
+        plan, error = plan_products_request(request.args)
+        if error:
+            return jsonify(error[0]), error[1]
+
+        rows_query, count_query, build = plan
+        products = db.session.execute(rows_query).all()
+        total = db.session.execute(count_query).scalar_one() if count_query is not None else None
+
+        cached = cache_entry(build(products, total))
+        product_cache.set_page(cache_key, cached)
+
+    return conditional_response(cached['etag'], lambda: jsonify(cached['body']), shared=True)
+
+def product_by_id_query(id):
+    return select(*product_rows.columns).where(Product.id == id)
+
+# Retrieve a product by ID
+@products_bp.route('/products/<int:id>', methods=['GET'])
+def get_product(id):
+    cached = product_cache.get_product(id)
+    if cached is None:
+        product = db.session.execute(product_by_id_query(id)).first()
+        if not product:
+            return jsonify({'message': 'Product not found'}), 404
+
+        cached = cache_entry(product_rows.row_to_dict(product))
+        product_cache.set_product(id, cached)
+
+    return conditional_response(cached['etag'], lambda: jsonify(cached['body']), shared=True)
+
+# Product cache hit/miss counters for sizing (per worker for the memory backend)
+@products_bp.route('/products/cache_stats', methods=['GET'])
+def get_product_cache_stats():
+    return jsonify(product_cache.stats()), 200
+
+# ----- Product Search -----
+
+def search_backend():
+    if current_app.config['SEARCH_BACKEND'] == 'auto':
+        return 'fulltext' if db.engine.dialect.name in ('mysql', 'mariadb') else 'memory'
+    return current_app.config['SEARCH_BACKEND']
+
+def parse_price_arg(name):
+    value = request.args.get(name, '')
+    if not value:
+        return None, None
+    try:
+        return float(value), None
+    except ValueError:
+        return None, ({'message': f'{name} must be a number'}, 400)
+
+# MATCH ... AGAINST in boolean mode: every word required, each as a prefix,
+# ranked by InnoDB's relevance score
+def fulltext_search_query(terms, limit, min_price=None, max_price=None, after=None):
+    score = match(Product.product_name, against=' '.join(f'+{term}*' for term in terms)).in_boolean_mode()
+    query = select(*product_rows.columns, score.label('score')).where(score)
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+    if after is not None:
+        query = query.where(or_(score < after[0], and_(score == after[0], Product.id > after[1])))
+    return query.order_by(score.desc(), Product.id).limit(limit)
+
+def fulltext_search(terms, limit, min_price, max_price, after):
+    rows = db.session.execute(fulltext_search_query(terms, limit, min_price, max_price, after)).all()
+    return [(row.score, row) for row in rows]
+
+def load_search_rows(product_ids=None):
+    query = select(Product.id, Product.product_name, Product.price)
+    if product_ids is not None:
+        query = query.where(Product.id.in_(product_ids))
+    return db.session.execute(query)
+
+# In-process inverted index (SQLite and test setups); ranks ids, then one
+# IN query loads the rows
+def memory_search(terms, limit, min_price, max_price, after):
+    search_index.sync(load_search_rows, load_search_rows)
+    hits = search_index.search(terms, limit, min_price, max_price, after)
+    if not hits:
+        return []
+
+    query = select(*product_rows.columns).where(Product.id.in_([product_id for _, product_id in hits]))
+    rows = {row.id: row for row in db.session.execute(query)}
+    return [(score, rows[product_id]) for score, product_id in hits if product_id in rows]
+
+# Search products by name: ?q=words&min_price=&max_price=&limit=&after=
+@products_bp.route('/products/search', methods=['GET'])
+def search_products():
+    terms = tokenize(request.args.get('q', ''))
+    limit = request.args.get('limit', 10, type=int)
+    cursor = request.args.get('after')
+
+    if not terms:
+        return jsonify({'message': 'q must contain at least one word'}), 400
+
+    if len(terms) > 10:
+        return jsonify({'message': 'q cannot have more than 10 words'}), 400
+
+    if limit < 1:
+        return jsonify({'message': 'limit must be a positive integer'}), 400
+
+    if limit > 100:
+        return jsonify({'message': 'limit cannot exceed 100'}), 400
+
+    min_price, error = parse_price_arg('min_price')
+    if error:
+        return jsonify(error[0]), error[1]
+    max_price, error = parse_price_arg('max_price')
+    if error:
+        return jsonify(error[0]), error[1]
+
+    after = None
+    if cursor:
+        after = decode_search_cursor(cursor)
+        if after is None:
+            return jsonify({'message': 'Invalid cursor'}), 400
+
+    search = fulltext_search if search_backend() == 'fulltext' else memory_search
+
+    # Fetch one extra hit to know whether another page exists
+    hits = search(terms, limit + 1, min_price, max_price, after)
+    has_next = len(hits) > limit
+    hits = hits[:limit]
+
+    return allow_shared_caching(jsonify({
+        'products': product_rows.dump(row for _, row in hits),
+        'pagination': {
+            'limit': limit,
+            'has_next': has_next,
+            'next_cursor': encode_search_cursor(hits[-1][0], hits[-1][1].id) if has_next else None
+        }
+    })), 200
+
+# Create a new product
+@products_bp.route('/products', methods=['POST'])
+def create_product():
+    try:
+        product_data = product_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    new_product = Product(product_name=product_data['product_name'], price=product_data['price'])
+    db.session.add(new_product)
+    db.session.commit()
+    invalidate_products([new_product.id])
+
+    return product_schema.jsonify(new_product), 201
+
+# Update an existing product by ID
+@products_bp.route('/products/<int:id>', methods=['PUT'])
+def update_product(id):
+    product = db.session.get(Product, id)
+
+    if not product:
+        return jsonify({'message': 'Product not found'}), 404
+
+    try:
+        product_data = product_schema.load(request.json, partial=True)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    if 'product_name' in product_data:
+        product.product_name = product_data['product_name']
+    if 'price' in product_data:
+        product.price = product_data['price']
+    db.session.commit()
+    invalidate_products([id])
+
+    return product_schema.jsonify(product), 200
+
+# Delete a product by ID
+@products_bp.route('/products/<int:id>', methods=['DELETE'])
+def delete_product(id):
+    product = db.session.get(Product, id)
+
+    if not product:
+        return jsonify({'message': 'Product not found'}), 404
+
+    remove_products_from_orders([id])
+    delete_product_sales([id])
+    db.session.delete(product)
+    db.session.commit()
+    invalidate_products([id])
+
+    return jsonify({'message': 'Product deleted successfully'}), 200
+
+def valid_product_id_list(product_ids):
+    return isinstance(product_ids, list) and all(
+        isinstance(i, int) and not isinstance(i, bool) for i in product_ids
+    )
+
+# Delete multiple products by IDs
+# The products can be in any number of orders, so the deletes run as a
+# background job (202 + job id); see delete_products_job
+@products_bp.route('/products/delete_multiple', methods=['DELETE'])
+def delete_multiple_products():
+    product_ids = request.json.get('product_ids', [])
+    if not product_ids:
+        return jsonify({'message': 'No product IDs provided'}), 400
+
+    if not valid_product_id_list(product_ids):
+        return jsonify({'message': 'product_ids must be a list of integers'}), 400
+
+    found = sorted(db.session.execute(select(Product.id).where(Product.id.in_(product_ids))).scalars())
+    if not found:
+        return jsonify({'message': 'No valid products found for the provided IDs'}), 404
+
+    job = enqueue_job('delete_products', {'product_ids': found}, total=len(found))
+    db.session.commit()
+    return job_accepted_response(job, f'Deleting {len(found)} products')
+
+# Set-based statements in chunks of JOB_BATCH_SIZE: the products' order lines
+# (with the order totals and rollups they count towards), then the products
+# and their product_sales rows.
+# Progress counts products deleted; result is {"deleted": n}.
+@job_handler('delete_products')
+def delete_products_job(job):
+    product_ids = job.payload['product_ids']
+    batch = current_app.config['JOB_BATCH_SIZE']
+    while remove_products_from_orders(product_ids, limit=batch):
+        yield 0
+
+    for start in range(job.progress, len(product_ids), batch):
+        chunk = product_ids[start:start + batch]
+        # Lines added since the pass above
+        remove_products_from_orders(chunk)
+        delete_product_sales(chunk)
+        deleted = db.session.execute(
+            delete(Product).where(Product.id.in_(chunk)), execution_options={'synchronize_session': False}
+        ).rowcount
+        job.result = {'deleted': (job.result or {}).get('deleted', 0) + deleted}
+        yield len(chunk)
+        invalidate_products(chunk)
+
+
+# ----- Bulk Product Endpoints -----
+
+# Rows of a bulk request as (row, parse error) pairs, from a JSON array (or
+# {"products": [...]}) or an NDJSON body. NDJSON is parsed line by line as
+# it is read, so a large feed is never held in memory at once.
+# Returns (rows, None) or (None, error response).
+def bulk_product_rows():
+    if request.mimetype == 'application/x-ndjson':
+        def parse_lines():
+            for line in request.stream:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line), None
+                except ValueError:
+                    yield None, {'_schema': ['Invalid JSON']}
+        return parse_lines(), None
+
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('products')
+    if not isinstance(payload, list):
+        return None, (jsonify({'message': 'Provide a list of products as a JSON array or NDJSON'}), 400)
+    return ((row, None) for row in payload), None
+
+def iter_chunks(items, size):
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+# Validate a whole chunk with one many=True load: each load() call has a
+# fixed overhead that adds up over a 50k-row feed. Returns the loaded rows
+# (aligned with the input) and errors by position in the chunk.
+def load_product_chunk(rows, partial):
+    try:
+        return products_schema.load(rows, partial=partial), {}
+    except ValidationError as err:
+        return err.valid_data, err.messages
+
+# Validate, write and commit one chunk at a time. check(data) returns extra
+# errors for a loaded row or None; write(valid) gets [(index, data)] and
+# returns (written count, per-row errors, changed product ids). Rows
+# committed in earlier chunks stay written even if a later chunk fails.
+def run_bulk_product_write(partial, check, write):
+    rows, error_response = bulk_product_rows()
+    if error_response:
+        return None, error_response
+
+    written, seen, errors = 0, 0, {}
+    for chunk in iter_chunks(enumerate(rows), current_app.config['BULK_PRODUCT_BATCH_SIZE']):
+        seen += len(chunk)
+        parsed = []
+        for index, (row, parse_error) in chunk:
+            if parse_error:
+                errors[index] = parse_error
+            else:
+                parsed.append((index, row))
+        if not parsed:
+            continue
+
+        loaded, load_errors = load_product_chunk([row for _, row in parsed], partial)
+        valid = []
+        for position, ((index, _), data) in enumerate(zip(parsed, loaded)):
+            row_errors = load_errors.get(position) or check(data)
+            if row_errors:
+                errors[index] = row_errors
+            else:
+                valid.append((index, data))
+        if not valid:
+            continue
+
+        try:
+            count, write_errors, changed_ids = write(valid)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            reason = getattr(e, 'orig', None) or e
+            errors.update({index: {'_schema': [f'Batch failed: {reason}']} for index, _ in valid})
+            continue
+        invalidate_products(changed_ids)
+        written += count
+        errors.update(write_errors)
+
+    if not seen:
+        return None, (jsonify({'message': 'Provide a non-empty list of products'}), 400)
+    return (written, errors), None
+
+def check_product_patch(data):
+    if data.get('id') is None:
+        return {'id': ['Missing data for required field.']}
+    if len(data) == 1:
+        return {'_schema': ['Provide product_name and/or price to update']}
+    return None
+
+# Create products in bulk; rows that carry an id are upserted
+@products_bp.route('/products/bulk', methods=['POST'])
+def create_products_bulk():
+    counts = {'created': 0, 'upserted': 0}
+
+    def write(valid):
+        new_rows = [
+            {'product_name': data['product_name'], 'price': data['price']}
+            for _, data in valid if data.get('id') is None
+        ]
+        upsert_rows = [
+            {'id': data['id'], 'product_name': data['product_name'], 'price': data['price']}
+            for _, data in valid if data.get('id') is not None
+        ]
+        # One executemany per kind of row
+        if new_rows:
+            db.session.execute(insert(Product.__table__), new_rows)
+        if upsert_rows:
+            db.session.execute(upsert_statement(Product.__table__, lambda new: {
+                'product_name': new.product_name, 'price': new.price
+            }), upsert_rows)
+
+        counts['created'] += len(new_rows)
+        counts['upserted'] += len(upsert_rows)
+        return len(valid), {}, [row['id'] for row in upsert_rows]
+
+    result, error_response = run_bulk_product_write(False, lambda data: None, write)
+    if error_response:
+        return error_response
+
+    # New ids are unknown to the search index: rebuild it on the next search,
+    # here and in the other processes
+    if counts['created']:
+        rebuild_search_index()
+        cache_invalidations.record('search_index')
+
+    written, errors = result
+    return jsonify({
+        'message': f'Created {counts["created"]} and upserted {counts["upserted"]} products',
+        'created': counts['created'],
+        'upserted': counts['upserted'],
+        'failed': len(errors),
+        'errors': errors
+    }), 201 if written else 400
+
+# Partially update products in bulk; every row needs an id
+@products_bp.route('/products/bulk', methods=['PATCH'])
+def update_products_bulk():
+    def write(valid):
+        # One IN lookup per chunk for ids that don't exist
+        ids = {data['id'] for _, data in valid}
+        found = set(db.session.execute(select(Product.id).where(Product.id.in_(ids))).scalars())
+        errors = {index: {'id': ['Product not found']} for index, data in valid if data['id'] not in found}
+        rows = [data for _, data in valid if data['id'] in found]
+
+        # Bulk UPDATE by primary key: one executemany per set of changed columns
+        if rows:
+            db.session.execute(update(Product), rows)
+        return len(rows), errors, ids & found
+
+    result, error_response = run_bulk_product_write(True, check_product_patch, write)
+    if error_response:
+        return error_response
+
+    updated, errors = result
+    return jsonify({
+        'message': f'Updated {updated} products',
+        'updated': updated,
+        'failed': len(errors),
+        'errors': errors
+    }), 200 if updated else 400
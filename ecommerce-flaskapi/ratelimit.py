@@ -0,0 +1,33 @@
+# Fixed-window rate limiting for the auth endpoints
+#
+# Counters live in one of the cache.py backends: memory (per worker), redis
+# (shared by every worker and host) or none (disabled). Each key gets one
+# counter per window, which expires with the window.
+import time
+
+
+def parse_limit(value):
+    # "20/60" -> 20 requests per 60 seconds
+    count, _, seconds = value.partition('/')
+    return int(count), int(seconds or 60)
+
+
+class RateLimiter:
+    def __init__(self, backend, limit, window, name, clock=time.time):
+        self.backend = backend
+        self.limit = limit
+        self.window = window
+        self.name = name
+        self._clock = clock
+
+    # Counts one attempt for key; returns seconds to wait when over the limit,
+    # otherwise None
+    def hit(self, key):
+        if self.limit <= 0:
+            return None
+        now = self._clock()
+        window_start = int(now // self.window) * self.window
+        count = self.backend.incr(f'ratelimit:{self.name}:{key}:{window_start}', ttl=self.window)
+        if count > self.limit:
+            return max(int(window_start + self.window - now), 1)
+        return None
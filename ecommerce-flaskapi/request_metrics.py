@@ -0,0 +1,177 @@
+# Per-endpoint request instrumentation, exported in Prometheus format
+#
+# For every request RequestMetrics records, labelled by Flask endpoint:
+#   - latency, status code and response size
+#   - SQL statements run and time spent in them (cursor execute events on
+#     every engine, so the async engine in asgi.py is counted too)
+#   - time spent encoding JSON responses
+#
+# Under gunicorn each worker has its own counters. Set PROMETHEUS_MULTIPROC_DIR
+# (an empty directory, shared by the workers) so prometheus_client writes
+# them to files there and GET /metrics adds up every worker; gunicorn.conf.py
+# cleans up after workers that exit.
+#
+# With SLOW_REQUEST_MS set, requests slower than that are logged together
+# with the SQL they ran (statements only, never parameters).
+from contextvars import ContextVar
+import os
+import time
+
+from flask import request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUESTS = Counter(
+    'http_requests', 'Requests handled', ['endpoint', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time from before_request to after_request',
+    ['endpoint', 'method'], buckets=LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_sql_queries', 'SQL statements executed per request',
+    ['endpoint', 'method'], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_SQL_TIME = Histogram(
+    'http_request_sql_duration_seconds', 'Time spent executing SQL per request',
+    ['endpoint', 'method'], buckets=LATENCY_BUCKETS
+)
+REQUEST_SERIALIZATION_TIME = Histogram(
+    'http_response_serialization_seconds', 'Time spent encoding JSON per request',
+    ['endpoint', 'method'], buckets=LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body size (streamed responses are not counted)',
+    ['endpoint', 'method'], buckets=SIZE_BUCKETS
+)
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'sql_seconds', 'serialization_seconds', 'statements')
+
+    def __init__(self, keep_statements):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.statements = [] if keep_statements else None
+
+
+# Stats of the request being handled in this thread / task; the async engine
+# runs its cursor events in a greenlet that inherits this context
+_current = ContextVar('request_stats', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('request_metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['request_metrics_started'].pop()
+    stats = _current.get()
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.queries += 1
+    stats.sql_seconds += elapsed
+    if stats.statements is not None:
+        stats.statements.append((elapsed, statement))
+
+
+def _handle_error(context):
+    if context.connection is not None:
+        started = context.connection.info.get('request_metrics_started')
+        if started:
+            started.pop()
+
+
+class RequestMetrics:
+    _engine_events = False
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.slow_request_seconds = app.config.get('SLOW_REQUEST_MS', 0) / 1000
+        self.logger = app.logger
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+        # Time spent in the JSON provider, whichever one is configured
+        dumps = app.json.dumps
+
+        def timed_dumps(obj, **kwargs):
+            stats = _current.get()
+            if stats is None:
+                return dumps(obj, **kwargs)
+            started = time.perf_counter()
+            try:
+                return dumps(obj, **kwargs)
+            finally:
+                stats.serialization_seconds += time.perf_counter() - started
+
+        app.json.dumps = timed_dumps
+
+        if not RequestMetrics._engine_events:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            RequestMetrics._engine_events = True
+
+    def _before_request(self):
+        request.environ['request_metrics.token'] = _current.set(RequestStats(self.slow_request_seconds > 0))
+
+    def _after_request(self, response):
+        stats = _current.get()
+        if stats is None:
+            return response
+
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+
+        REQUESTS.labels(endpoint, method, str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(endpoint, method).observe(elapsed)
+        REQUEST_QUERIES.labels(endpoint, method).observe(stats.queries)
+        REQUEST_SQL_TIME.labels(endpoint, method).observe(stats.sql_seconds)
+        REQUEST_SERIALIZATION_TIME.labels(endpoint, method).observe(stats.serialization_seconds)
+        if not response.is_streamed and response.content_length is not None:
+            RESPONSE_SIZE.labels(endpoint, method).observe(response.content_length)
+
+        if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+            self.log_slow_request(endpoint, elapsed, stats)
+        return response
+
+    def _teardown_request(self, exc):
+        token = request.environ.pop('request_metrics.token', None)
+        if token is not None:
+            _current.reset(token)
+
+    def log_slow_request(self, endpoint, elapsed, stats):
+        lines = [
+            f'Slow request: {request.method} {request.full_path.rstrip("?")} ({endpoint}) '
+            f'took {elapsed * 1000:.1f} ms, {stats.queries} SQL statements in {stats.sql_seconds * 1000:.1f} ms, '
+            f'JSON encoding {stats.serialization_seconds * 1000:.1f} ms'
+        ]
+        lines.extend(f'  {seconds * 1000:8.1f} ms  {" ".join(statement.split())}' for seconds, statement in stats.statements)
+        self.logger.warning('\n'.join(lines))
+
+
+# Prometheus text format; sums every worker's files in multiprocess mode
+def render_metrics():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,77 @@
+# Marshmallow schemas and row serializers
+#
+# The auto schemas generate their fields from the models when the classes are
+# created, which is a noticeable share of importing the app. They are built
+# on first use instead, so CLI commands and gunicorn's master never pay for
+# them unless a request needs them; the module-level names are proxies.
+from functools import cache
+
+from marshmallow import fields
+from werkzeug.local import LocalProxy
+
+from extensions import ma
+from models import User, Order, Product
+from serializers import RowSerializer
+
+
+@cache
+def build_schemas():
+    # Defining Marshmallow Schemas for serialization/deserialization
+    class UserSchema(ma.SQLAlchemyAutoSchema):
+        password = fields.String(load_only=True, required=True)
+
+        class Meta:
+            model = User
+            exclude = ('deleted_at',)
+
+    class OrderSchema(ma.SQLAlchemyAutoSchema):
+        class Meta:
+            model = Order
+            include_fk = True
+            unknown = 'EXCLUDE'  # Ignore unknown fields like product_ids
+            dump_only = ('total_price', 'item_count')
+
+    class ProductSchema(ma.SQLAlchemyAutoSchema):
+        class Meta:
+            model = Product
+
+    # Create instances of the schemas
+    user_schema = UserSchema()
+    users_schema = UserSchema(many=True)
+    order_schema = OrderSchema()
+    orders_schema = OrderSchema(many=True)
+    product_schema = ProductSchema()
+    products_schema = ProductSchema(many=True)
+
+    # Precompiled row serializers for hot list reads - same output as the schemas,
+    # built from select(...) column tuples instead of ORM objects
+    user_rows = RowSerializer(user_schema, User)
+    order_rows = RowSerializer(order_schema, Order)
+    product_rows = RowSerializer(product_schema, Product)
+
+    return {
+        'user_schema': user_schema,
+        'users_schema': users_schema,
+        'order_schema': order_schema,
+        'orders_schema': orders_schema,
+        'product_schema': product_schema,
+        'products_schema': products_schema,
+        'user_rows': user_rows,
+        'order_rows': order_rows,
+        'product_rows': product_rows,
+    }
+
+
+def _lazy(name):
+    return LocalProxy(lambda: build_schemas()[name])
+
+
+user_schema = _lazy('user_schema')
+users_schema = _lazy('users_schema')
+order_schema = _lazy('order_schema')
+orders_schema = _lazy('orders_schema')
+product_schema = _lazy('product_schema')
+products_schema = _lazy('products_schema')
+user_rows = _lazy('user_rows')
+order_rows = _lazy('order_rows')
+product_rows = _lazy('product_rows')
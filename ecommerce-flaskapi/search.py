@@ -0,0 +1,181 @@
+# Product search helpers
+#
+# On MySQL, GET /products/search runs against a FULLTEXT index on
+# products.product_name (see models.py). InvertedIndex is the fallback for
+# SQLite and test setups: an in-memory index with the same behaviour
+# (every query word matched as a prefix, relevance ranking, price filters,
+# keyset cursors over (score, id)).
+import base64
+from bisect import bisect_left, bisect_right, insort
+import json
+import math
+import re
+import threading
+import time
+
+_TOKEN = re.compile(r'\w+')
+
+# Relevance weight of a prefix match relative to an exact word match
+PREFIX_WEIGHT = 0.5
+
+# Shorter query words only match whole words; a one-letter prefix would
+# touch a large share of the catalog (MySQL skips such words entirely)
+MIN_PREFIX_LENGTH = 2
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+# Search cursors carry the (score, id) of the last hit so the next page can
+# seek past it in ranking order
+def encode_search_cursor(score, last_id):
+    raw = json.dumps({'score': score, 'id': last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_search_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        score, last_id = data['score'], data['id']
+    except (ValueError, TypeError, KeyError):
+        return None
+    if not isinstance(last_id, int) or not isinstance(score, (int, float)):
+        return None
+    return float(score), last_id
+
+
+class InvertedIndex:
+    def __init__(self, ttl=300, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._stale_ids = set()
+        self._clear()
+
+    def _clear(self):
+        self._postings = {}   # word -> set of product ids
+        self._words = []      # sorted vocabulary, for prefix ranges
+        self._docs = {}       # product id -> (words, price)
+
+    # ----- Maintenance -----
+
+    def _add(self, product_id, name, price):
+        self._remove(product_id)
+        words = frozenset(tokenize(name or ''))
+        self._docs[product_id] = (words, price)
+        for word in words:
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                insort(self._words, word)
+            ids.add(product_id)
+
+    def _remove(self, product_id):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        for word in doc[0]:
+            ids = self._postings[word]
+            ids.discard(product_id)
+            if not ids:
+                del self._postings[word]
+                del self._words[bisect_left(self._words, word)]
+
+    def mark_stale(self, product_ids):
+        with self._lock:
+            self._stale_ids.update(product_ids)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    # load_all() yields every (id, name, price); load_some(ids) the same for
+    # just those ids. Full rebuild when never built or older than ttl, so
+    # writes made by other workers show up within ttl seconds.
+    def sync(self, load_all, load_some):
+        with self._lock:
+            now = self._clock()
+            if self._built_at is None or now - self._built_at >= self.ttl:
+                self._clear()
+                for product_id, name, price in load_all():
+                    self._add(product_id, name, price)
+                self._built_at = now
+                self._stale_ids.clear()
+            elif self._stale_ids:
+                stale, self._stale_ids = self._stale_ids, set()
+                for product_id in stale:
+                    self._remove(product_id)
+                for product_id, name, price in load_some(stale):
+                    self._add(product_id, name, price)
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ----- Search -----
+
+    def _matches(self, term):
+        if len(term) < MIN_PREFIX_LENGTH:
+            return [term] if term in self._postings else []
+        # Every vocabulary word starting with term (including term itself)
+        start = bisect_left(self._words, term)
+        end = bisect_left(self._words, term + '\U0010ffff', start)
+        return self._words[start:end]
+
+    def _idf(self, word):
+        return math.log(1 + len(self._docs) / len(self._postings[word]))
+
+    # Products matching one query term, grouped by the (rounded) weight of
+    # their best matching word. Set operations keep this in C even when a
+    # prefix covers a large part of the catalog.
+    def _term_groups(self, term):
+        weighted = sorted(
+            ((round(self._idf(word) * (1.0 if word == term else PREFIX_WEIGHT), 6), word)
+             for word in self._matches(term)),
+            reverse=True
+        )
+        groups, matched = {}, set()
+        for weight, word in weighted:
+            ids = self._postings[word] - matched
+            if ids:
+                matched |= ids
+                groups.setdefault(weight, set()).update(ids)
+        return groups, matched
+
+    # Returns up to limit (score, product_id) pairs, best first, ties by id
+    def search(self, terms, limit, min_price=None, max_price=None, after=None):
+        with self._lock:
+            per_term = [self._term_groups(term) for term in set(terms)]
+            if len(per_term) == 1:
+                groups = per_term[0][0]
+            else:
+                # A product must match every term; its score is the sum
+                candidates = set.intersection(*(matched for _, matched in per_term))
+                totals = dict.fromkeys(candidates, 0.0)
+                for term_groups, _ in per_term:
+                    for weight, ids in term_groups.items():
+                        for product_id in ids.intersection(candidates):
+                            totals[product_id] += weight
+                groups = {}
+                for product_id, total in totals.items():
+                    groups.setdefault(round(total, 6), []).append(product_id)
+
+            # Walk score groups best first and ids ascending, so only the
+            # hits up to the page limit are ever price checked
+            hits = []
+            for score in sorted(groups, reverse=True):
+                if after is not None and score > after[0]:
+                    continue
+                ids = sorted(groups[score])
+                if after is not None and score == after[0]:
+                    ids = ids[bisect_right(ids, after[1]):]
+                for product_id in ids:
+                    price = self._docs[product_id][1]
+                    if (min_price is not None and price < min_price) or (max_price is not None and price > max_price):
+                        continue
+                    hits.append((score, product_id))
+                    if len(hits) == limit:
+                        return hits
+            return hits
@@ -0,0 +1,69 @@
+# Token revocation and cached user profiles for the authenticated endpoints
+#
+# Access tokens are short-lived and renewed with a refresh token, and both
+# are checked from their signature alone. Revoking a token (logout), or
+# every token a user holds (account deletion), writes an entry to one of the
+# cache.py backends: the cache_entries table by default, so every worker
+# sees it on the next request. The entry expires when the token it blocks
+# would have, so the denylist only ever holds tokens that could still be used.
+#
+# UserCache keeps serialized profiles keyed by user id, so /users/me and
+# /users/<id> can answer without a database round trip. update_user and
+# delete_user drop the entry, and the other processes follow through the
+# cache_invalidations table (invalidations.py).
+import math
+import time
+
+from cache import MemoryCache
+
+
+class TokenDenylist:
+    # max_ttl: the longest a token can live (the refresh token lifetime), or
+    # None when tokens never expire
+    def __init__(self, backend, max_ttl=None, clock=time.time):
+        self.backend = backend
+        self.max_ttl = max_ttl
+        self._clock = clock
+
+    def _ttl(self, expires_at):
+        if expires_at is None:
+            return self.max_ttl
+        return max(math.ceil(expires_at - self._clock()), 1)
+
+    def revoke(self, claims):
+        self.backend.set(f'revoked:jti:{claims["jti"]}', 1, self._ttl(claims.get('exp')))
+
+    # Every token issued to user_id until now
+    def revoke_user(self, user_id):
+        self.backend.set(f'revoked:user:{user_id}', self._clock(), self.max_ttl)
+
+    def is_revoked(self, claims):
+        if self.backend.get(f'revoked:jti:{claims["jti"]}') is not None:
+            return True
+        revoked_at = self.backend.get(f'revoked:user:{claims["sub"]}')
+        return revoked_at is not None and claims['iat'] <= revoked_at
+
+
+class UserCache:
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def key(user_id):
+        return f'user:{user_id}'
+
+    def get(self, user_id):
+        return self.backend.get(self.key(user_id))
+
+    def set(self, user_id, payload):
+        self.backend.set(self.key(user_id), payload, self.ttl)
+
+    def invalidate(self, user_id):
+        self.backend.delete(self.key(user_id))
+
+    # Drops what this process cached; a shared backend was already cleared
+    # by the writer
+    def invalidate_all(self):
+        if isinstance(self.backend, MemoryCache):
+            self.backend.clear()
@@ -0,0 +1,322 @@
+# User and auth endpoints
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import (
+    create_access_token, create_refresh_token, decode_token, jwt_required, get_jwt, get_jwt_identity
+)
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from marshmallow import ValidationError
+from sqlalchemy import func, select, delete
+
+from exports import stream_export
+from extensions import (
+    db, jwt, password_hasher, auth_ip_limiter, auth_email_limiter, token_denylist, user_cache, cache_invalidations
+)
+from invalidations import invalidation_handler
+from jobs import enqueue_job, job_accepted_response, job_handler
+from models import User, Order, UserOrderSummary
+from order_totals import delete_orders
+from passwords import PasswordHasherBusy
+from schemas import user_schema, user_rows
+
+users_bp = Blueprint('users', __name__)
+
+
+# ----- Auth Throttling -----
+def too_many_attempts(retry_after):
+    response = jsonify({'message': 'Too many attempts, try again later'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+# Counts one attempt against the client IP and, when given, the email
+def check_auth_rate_limit(email=None):
+    retry_after = auth_ip_limiter.hit(request.remote_addr)
+    if retry_after is None and email:
+        retry_after = auth_email_limiter.hit(email.strip().lower())
+    return too_many_attempts(retry_after) if retry_after else None
+
+# Every hashing slot was taken for PASSWORD_HASH_WAIT seconds
+def hashing_busy():
+    response = jsonify({'message': 'Too many logins in progress, try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+# ----- Tokens -----
+
+# Runs on every authenticated request; answers from the denylist store
+# without touching the database
+@jwt.token_in_blocklist_loader
+def token_revoked(jwt_header, jwt_payload):
+    return token_denylist.is_revoked(jwt_payload)
+
+# Drops users from this process's profile cache; None drops them all.
+# Other processes call it for the writes they read from cache_invalidations.
+@invalidation_handler('users')
+def forget_users(user_ids):
+    if user_ids is None:
+        user_cache.invalidate_all()
+        return
+    for user_id in user_ids:
+        user_cache.invalidate(int(user_id))
+
+# Called after a committed user write, here and (within CACHE_SYNC_INTERVAL)
+# in the other processes
+def invalidate_user(user_id):
+    forget_users([user_id])
+    cache_invalidations.record('users', [user_id])
+
+# Serialized profile for user_id, from the user cache when possible; users
+# being deleted count as missing
+def cached_profile(user_id):
+    payload = user_cache.get(user_id)
+    if payload is None:
+        user = db.session.get(User, user_id)
+        if not user or user.deleted_at is not None:
+            return None
+        payload = user_schema.dump(user)
+        user_cache.set(user_id, payload)
+    return payload
+
+
+# Retrieve all users
+@users_bp.route('/users', methods=['GET'])
+def get_users():
+    query = select(*user_rows.columns)
+    users = db.session.execute(query).all()
+    return jsonify(user_rows.dump(users)), 200
+
+# Retrieve a user by ID
+@users_bp.route('/users/<int:id>', methods=['GET'])
+def get_user(id):
+    payload = cached_profile(id)
+    if payload is None:
+        return jsonify({'message': 'User not found'}), 404
+    return jsonify(payload), 200
+
+# Register a new user with hashed password
+@users_bp.route('/register', methods=['POST'])
+def register():
+    try:
+        data = request.json
+
+        limited = check_auth_rate_limit()
+        if limited:
+            return limited
+
+        # Check if user already exists
+        existing_user = db.session.execute(
+            select(User).where(User.email == data.get('email'))
+        ).scalar_one_or_none()
+
+        if existing_user:
+            return jsonify({'message': 'User already exists'}), 400
+
+        # Hash the password
+        hashed_password = password_hasher.hash(data['password'])
+
+        new_user = User(
+            name=data['name'],
+            address=data.get('address', ''),
+            email=data['email'],
+            password=hashed_password
+        )
+
+        db.session.add(new_user)
+        db.session.commit()
+
+        return jsonify({'message': 'User registered successfully', 'user_id': new_user.id}), 201
+
+    except KeyError as e:
+        return jsonify({'message': f'Missing field: {str(e)}'}), 400
+    except PasswordHasherBusy:
+        return hashing_busy()
+    except Exception as e:
+        return jsonify({'message': 'An error occurred', 'error': str(e)}), 500
+
+# Login user
+@users_bp.route('/login', methods=['POST'])
+def login():
+    email = request.json.get('email')
+    password = request.json.get('password')
+
+    if not email or not password:
+        return jsonify({'message': 'Email and password are required'}), 400
+
+    limited = check_auth_rate_limit(email)
+    if limited:
+        return limited
+
+    user = db.session.execute(
+        select(User).where(User.email == email)
+    ).scalar_one_or_none()
+
+    # Accounts being deleted can't log in again
+    if not user or user.deleted_at is not None:
+        return jsonify({'message': 'Invalid email or password'}), 401
+
+    try:
+        valid, new_hash = password_hasher.verify_and_update(user.password, password)
+    except PasswordHasherBusy:
+        return hashing_busy()
+
+    if not valid:
+        return jsonify({'message': 'Invalid email or password'}), 401
+
+    # Stored hash used an older PASSWORD_HASH_METHOD; upgrade it while we have the password
+    if new_hash:
+        user.password = new_hash
+        db.session.commit()
+
+    # Create access and refresh tokens
+    access_token = create_access_token(identity=str(user.id))
+    refresh_token = create_refresh_token(identity=str(user.id))
+
+    # Clients load /users/me right after logging in
+    user_cache.set(user.id, user_schema.dump(user))
+
+    return jsonify({
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'user_id': user.id,
+        'name': user.name
+    }), 200
+
+# Exchange a refresh token for a new access token
+@users_bp.route('/token/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh_access_token():
+    current_user_id = get_jwt_identity()
+
+    # Refreshes are rare, so this is where a deleted account, or one being
+    # deleted, is always caught
+    user_id = db.session.execute(
+        select(User.id).where(User.id == int(current_user_id), User.deleted_at.is_(None))
+    ).scalar_one_or_none()
+
+    if user_id is None:
+        return jsonify({'message': 'User not found'}), 401
+
+    return jsonify({'access_token': create_access_token(identity=current_user_id)}), 200
+
+# Revoke the token used for this request and, when given, the refresh token
+@users_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if refresh_token:
+        try:
+            claims = decode_token(refresh_token, allow_expired=True)
+        except (JWTExtendedException, PyJWTError):
+            return jsonify({'message': 'Invalid refresh token'}), 400
+        if claims['sub'] != get_jwt_identity():
+            return jsonify({'message': 'Unauthorized access'}), 403
+        token_denylist.revoke(claims)
+
+    token_denylist.revoke(get_jwt())
+    return jsonify({'message': 'Logged out successfully'}), 200
+
+# Get current user profile
+@users_bp.route('/users/me', methods=['GET'])
+@jwt_required()
+def get_current_user():
+    current_user_id = get_jwt_identity()
+    # Convert user_id back to int
+    payload = cached_profile(int(current_user_id))
+
+    if payload is None:
+        return jsonify({'message': 'User not found'}), 404
+
+    return jsonify(payload), 200
+
+# Update an existing user by ID
+@users_bp.route('/users/<int:id>', methods=['PUT'])
+@jwt_required()
+def update_user(id):
+    current_user_id = int(get_jwt_identity())
+
+    # Users can only update their own profile
+    if current_user_id != id:
+        return jsonify({'message': 'Unauthorized access'}), 403
+
+    user = db.session.get(User, id)
+
+    if not user:
+        return jsonify({'message': 'Invalid user id'}), 400
+
+    try:
+        user_data = user_schema.load(request.json, partial=True)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    if 'name' in user_data:
+        user.name = user_data['name']
+    if 'address' in user_data:
+        user.address = user_data['address']
+    if 'email' in user_data:
+        user.email = user_data['email']
+    if 'password' in user_data:
+        try:
+            user.password = password_hasher.hash(user_data['password'])
+        except PasswordHasherBusy:
+            return hashing_busy()
+    db.session.commit()
+    invalidate_user(id)
+
+    return user_schema.jsonify(user), 200
+
+# Delete a user by ID
+@users_bp.route('/users/<int:id>', methods=['DELETE'])
+@jwt_required()
+def delete_user(id):
+    current_user_id = int(get_jwt_identity())
+
+    # Users can only delete their own profile
+    if current_user_id != id:
+        return jsonify({'message': 'Unauthorized access'}), 403
+
+    user = db.session.get(User, id)
+
+    if not user or user.deleted_at is not None:
+        return jsonify({'message': 'User not found'}), 404
+
+    # The user's orders go with them, which can be any number of rows, so the
+    # deletes run as a background job (202 + job id); see delete_user_job.
+    # The account is marked now, so its tokens, logins and refreshes stop
+    # working before the job runs.
+    order_count = db.session.execute(select(func.count()).where(Order.user_id == id)).scalar()
+    user.deleted_at = func.now()
+    job = enqueue_job('delete_user', {'user_id': id}, total=order_count)
+    db.session.commit()
+    invalidate_user(id)
+    token_denylist.revoke_user(id)
+
+    return job_accepted_response(job, 'Deleting user')
+
+# The user's orders JOB_BATCH_SIZE at a time (with the totals and rollups
+# they count towards), then the user. Progress counts orders deleted.
+@job_handler('delete_user')
+def delete_user_job(job):
+    user_id = job.payload['user_id']
+    batch = current_app.config['JOB_BATCH_SIZE']
+    while True:
+        order_ids = db.session.execute(
+            select(Order.id).where(Order.user_id == user_id).order_by(Order.id).limit(batch)
+        ).scalars().all()
+        if not order_ids:
+            break
+        delete_orders(order_ids)
+        yield len(order_ids)
+
+    db.session.execute(delete(UserOrderSummary).where(UserOrderSummary.user_id == user_id))
+    deleted = db.session.execute(delete(User).where(User.id == user_id)).rowcount
+    job.result = {'user_deleted': bool(deleted), 'orders_deleted': job.progress}
+    yield 0
+    # Also covers tokens issued while the orders were being deleted
+    invalidate_user(user_id)
+    token_denylist.revoke_user(user_id)
+
+# Stream all users (passwords are never included)
+@users_bp.route('/users/export', methods=['GET'])
+def export_users():
+    return stream_export('users', select(*user_rows.columns), User.id, user_rows)